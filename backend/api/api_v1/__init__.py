@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
 from api.api_v1.endpoints.actuators import router as actuators_router
+from api.api_v1.endpoints.diagnostics import router as diagnostics_router
 from api.api_v1.endpoints.layouts import router as layouts_router
 from api.api_v1.endpoints.plugins import router as plugin_router
 from api.api_v1.endpoints.sensors import router as sensors_router
@@ -14,3 +15,4 @@ router.include_router(websocket_router)
 router.include_router(plugin_router)
 router.include_router(sensors_router)
 router.include_router(actuators_router)
+router.include_router(diagnostics_router)
@@ -1,11 +1,12 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from crud.actuators import ActuatorCRUD
 from db.database import get_async_session
 from schemas.actuators import ActuatorRead, ActuatorUpdate
+from services.response_cache import response_cache
 from utils.automations import AutomationEngine
 from utils.dependencies import get_automation_engine
 
@@ -24,8 +25,15 @@ async def actuators_update(
 
 
 @router.get("/get/all", response_model=Optional[List[ActuatorRead]])
-async def get_sensors(session: AsyncSession = Depends(get_async_session)):
-    return await ActuatorCRUD.get_all(session)
+async def get_sensors(
+    request: Request, session: AsyncSession = Depends(get_async_session)
+):
+    return await response_cache.respond(
+        request,
+        "actuators",
+        Optional[List[ActuatorRead]],
+        lambda: ActuatorCRUD.get_all(session),
+    )
 
 
 @router.get("/get/{device_id}", response_model=ActuatorRead)
@@ -0,0 +1,12 @@
+from typing import Dict
+
+from fastapi import APIRouter
+
+from db.database import pool_status
+
+router = APIRouter(prefix="/diagnostics", tags=["diagnostics"])
+
+
+@router.get("/db-pool", response_model=Dict[str, float])
+async def get_db_pool():
+    return pool_status()
@@ -1,18 +1,26 @@
 from typing import Optional, List, Any
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from crud.layouts import Layout
 from db.database import get_async_session
 from schemas.layouts import LayoutSchema
+from services.response_cache import response_cache
 
 router = APIRouter(prefix="/layouts", tags=["layouts"])
 
 
 @router.get("/get", response_model=Optional[LayoutSchema] | List[Any])
-async def get_layout(session: AsyncSession = Depends(get_async_session)):
-    return await Layout.get(session=session)
+async def get_layout(
+    request: Request, session: AsyncSession = Depends(get_async_session)
+):
+    return await response_cache.respond(
+        request,
+        "layouts",
+        Optional[LayoutSchema] | List[Any],
+        lambda: Layout.get(session=session),
+    )
 
 
 @router.patch("/save", response_model=LayoutSchema)
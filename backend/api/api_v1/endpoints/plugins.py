@@ -1,20 +1,23 @@
 from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 
 from crud.plugins import Plugins
 from db.database import get_async_session
 from schemas.common import CommonResponse
 from schemas.plugins import PluginReadSchema, PluginUpdateSchema
+from services.response_cache import response_cache
 from utils.collector import restart_collector
 
 router = APIRouter(prefix="/plugins", tags=["Plugins"])
 
 
 @router.get("/get", response_model=List[PluginReadSchema])
-async def list_plugins(session=Depends(get_async_session)):
-    return await Plugins.get_all(session)
+async def list_plugins(request: Request, session=Depends(get_async_session)):
+    return await response_cache.respond(
+        request, "plugins", List[PluginReadSchema], lambda: Plugins.get_all(session)
+    )
 
 
 @router.post("/reload", response_model=CommonResponse)
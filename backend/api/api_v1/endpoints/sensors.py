@@ -1,26 +1,155 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.settings import settings
 from crud.sensors import SensorDataCRUD
 from db.database import get_async_session
-from schemas.sensors import SensorReadSchema, SensoeUpdateSchema, SensorDataReadSchema
+from schemas.sensors import (
+    SensorHistoryPoint,
+    SensorReadSchema,
+    SensorSeries,
+    SensoeUpdateSchema,
+)
+from services.response_cache import response_cache
+from utils import columnar
 
 router = APIRouter(prefix="/sensors", tags=["sensors"])
 
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _columnar_response(series, width: int, next_cursor: Optional[str] = None) -> Response:
+    headers = {"Vary": "Accept"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(
+        columnar.encode(series, width),
+        media_type=columnar.content_type(width),
+        headers=headers,
+    )
+
 
 @router.get("/get/all", response_model=List[SensorReadSchema])
-async def get_sensors(session: AsyncSession = Depends(get_async_session)):
-    return await SensorDataCRUD.get_all(session=session)
+async def get_sensors(
+    request: Request, session: AsyncSession = Depends(get_async_session)
+):
+    return await response_cache.respond(
+        request,
+        "sensors",
+        List[SensorReadSchema],
+        lambda: SensorDataCRUD.get_all_json(session=session),
+    )
 
 
-@router.get("/get/history/{device_id}", response_model=List[SensorDataReadSchema])
+@router.get("/get/history/{device_id}", response_model=List[SensorHistoryPoint])
 async def get_sensors_history(
-    device_id: str, session: AsyncSession = Depends(get_async_session)
+    device_id: str,
+    request: Request,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = Query(
+        settings.app_settings.history_limit,
+        ge=1,
+        le=settings.app_settings.history_max_limit,
+    ),
+    cursor: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=1),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    History page, newest first. When more points are left, the X-Next-Cursor
+    header holds the cursor of the next page. Sent in the columnar encoding
+    if the Accept header asks for it.
+    """
+    history = await SensorDataCRUD.get_history_rows(
+        session=session,
+        device_id=device_id,
+        start=start,
+        end=end,
+        limit=limit,
+        cursor=cursor,
+        max_points=max_points,
+    )
+    width = columnar.negotiate(request.headers.get("accept"))
+    if width is None:
+        headers = {"Vary": "Accept"}
+        if history.next_cursor:
+            headers["X-Next-Cursor"] = history.next_cursor
+        return Response(
+            SensorDataCRUD.history_json(device_id, history),
+            media_type="application/json",
+            headers=headers,
+        )
+    series = (
+        device_id,
+        history.unit,
+        history.resolution,
+        [row[0] for row in history.rows],
+        [row[1] for row in history.rows],
+    )
+    return _columnar_response([series], width, history.next_cursor)
+
+
+@router.get("/get/history", response_model=List[SensorSeries])
+async def get_sensors_history_batch(
+    request: Request,
+    response: Response,
+    device_ids: List[str] = Query(..., alias="device_id", min_length=1),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    max_points: int = Query(
+        settings.app_settings.history_limit,
+        ge=1,
+        le=settings.app_settings.history_max_limit,
+    ),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    History of several sensors (repeated device_id) in columns, one series
+    per sensor with at most max_points points, oldest first. Sent in the
+    columnar encoding if the Accept header asks for it.
+    """
+    series = await SensorDataCRUD.get_history_batch(
+        session=session,
+        device_ids=device_ids,
+        max_points=max_points,
+        start=start,
+        end=end,
+    )
+    width = columnar.negotiate(request.headers.get("accept"))
+    if width is None:
+        response.headers["Vary"] = "Accept"
+        return series
+    return _columnar_response(
+        (
+            (item.device_id, item.unit, item.resolution, item.timestamps, item.values)
+            for item in series
+        ),
+        width,
+    )
+
+
+@router.get("/export/{device_id}", response_class=StreamingResponse)
+async def export_sensor_history(
+    device_id: str,
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    return await SensorDataCRUD.get_history(session=session, device_id=device_id)
+    """Whole retained history of a sensor as a streamed NDJSON or CSV file."""
+    chunks = await SensorDataCRUD.export_history(
+        session=session, device_id=device_id, fmt=fmt, start=start, end=end
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{device_id}.{fmt}"'},
+    )
 
 
 @router.get("/get/{device_id}", response_model=SensorReadSchema)
@@ -30,9 +159,19 @@ async def get_sensor(device_id: str, session: AsyncSession = Depends(get_async_s
 
 @router.get("/get/avg_value/{measure_unit}", response_model=Optional[float])
 async def get_avg_value(
-    measure_unit: str, session: AsyncSession = Depends(get_async_session)
+    measure_unit: str,
+    window: Optional[int] = Query(None, ge=1),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    return await SensorDataCRUD.get_av_value(session=session, measure_unit=measure_unit)
+    """
+    Average over the latest readings of the sensors with the unit, or over
+    the last `window` seconds of their history.
+    """
+    return await SensorDataCRUD.get_av_value(
+        session=session,
+        measure_unit=measure_unit,
+        window=timedelta(seconds=window) if window else None,
+    )
 
 
 @router.patch("/update", response_model=SensorReadSchema)
@@ -1,5 +1,4 @@
 import asyncio
-import json
 import logging
 from contextlib import asynccontextmanager
 from typing import Dict, Set, Optional
@@ -9,6 +8,7 @@ from fastapi import APIRouter, WebSocket
 from starlette.websockets import WebSocketDisconnect
 
 from core.settings import settings
+from utils import codec
 
 router = APIRouter(tags=["websocket"])
 logger = logging.getLogger(__name__)
@@ -53,7 +53,7 @@ async def websocket_endpoint(websocket: WebSocket):
                         websocket.receive_text(), timeout=60.0
                     )
                     try:
-                        data = json.loads(message)
+                        data = codec.loads(message)
                         action = data.get("action")
                         sensor_id = data.get("sensor_id")
                         if action == "subscribe":
@@ -72,7 +72,7 @@ async def websocket_endpoint(websocket: WebSocket):
                             await websocket.send_json(
                                 {"subscriptions": list(active_connections[websocket])}
                             )
-                    except (json.JSONDecodeError, KeyError) as e:
+                    except (ValueError, KeyError, AttributeError) as e:
                         logger.warning(f"Invalid JSON: {e}")
                         await websocket.send_json({"error": "Invalid message format"})
 
@@ -139,7 +139,7 @@ async def redis_listener(websocket: WebSocket):
                                 await send_buffered_messages(websocket, message_buffer)
                                 message_buffer.clear()
 
-                        except (json.JSONDecodeError, KeyError) as e:
+                        except (ValueError, KeyError) as e:
                             logger.warning(f"Ошибка парсинга данных: {e}")
 
                 except asyncio.CancelledError:
@@ -163,8 +163,8 @@ async def send_buffered_messages(websocket: WebSocket, messages: list):
 
         for message in messages:
             try:
-                data = json.loads(message["data"])
-                device_id = data.get("device_id")
+                raw = message["data"]
+                device_id = codec.loads(raw).get("device_id")
 
                 if (
                     device_id
@@ -172,13 +172,16 @@ async def send_buffered_messages(websocket: WebSocket, messages: list):
                     and websocket.client_state != "disconnected"
                 ):
                     try:
-                        await websocket.send_text(json.dumps(data))
+                        # Пересылаем исходный JSON из Redis без повторной сериализации
+                        await websocket.send_text(
+                            raw.decode("utf-8") if isinstance(raw, bytes) else raw
+                        )
                     except WebSocketDisconnect:
                         if websocket in active_connections:
                             del active_connections[websocket]
                             return
 
-            except (json.JSONDecodeError, KeyError):
+            except (ValueError, KeyError, AttributeError):
                 continue
 
     except WebSocketDisconnect:
@@ -5,13 +5,15 @@ from typing import List, Dict, Optional
 import redis.asyncio as redis
 
 from core.settings import settings
+from db.database import session_factory
 from plugins.template import DevicePlugin
 from schemas.sensors import SensorMessage
 from services.base_collector import BaseCollector
+from services.batch_queue import BatchQueue
 from services.batch_saver import save_batch_to_db, extract_numeric_value
 from services.mqtt_client import AsyncMQTTClient
-from services.mqtt_helper import publish_with_retry, create_mqtt_client
-from services.redis_publisher import publish_to_redis
+from services.mqtt_helper import create_mqtt_client
+from services.mqtt_publisher import OutboundPublisher
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +21,8 @@ logger = logging.getLogger(__name__)
 class DataCollector(BaseCollector):
     """
     Collector of data from internal plugins of devices.
-    Collects data, stores it in a database (batch), and publishes it to Redis and MQTT.
+    Collects data, stores it in a database (batch), and publishes every batch
+    to Redis and MQTT.
     """
 
     def __init__(
@@ -30,7 +33,6 @@ class DataCollector(BaseCollector):
     ):
         """
         :param plugins: список плагинов устройств
-        :param db_session: сессия БД
         :param redis_client: клиент Redis (может быть None)
         :param mqtt_client: клиент MQTT (может быть None)
         """
@@ -41,6 +43,8 @@ class DataCollector(BaseCollector):
         self._last_batch_check: float = 0.0
         self._last_redis_check: float = 0.0
         self._last_mqtt_check: float = 0.0
+        self._queue: Optional[BatchQueue] = None
+        self._publisher: Optional[OutboundPublisher] = None
         for i, plugin in enumerate(self.plugins):
             if not isinstance(plugin, DevicePlugin):
                 logger.error(f"Plugin # {i} is not DevicePlugin: {type(plugin)}")
@@ -56,6 +60,78 @@ class DataCollector(BaseCollector):
             return
         if not self.mqtt_client:
             self.mqtt_client = create_mqtt_client()
+        self._publisher = OutboundPublisher(self.mqtt_client, self.redis_client)
+        if settings.collector.concurrent:
+            await self._collect_concurrent()
+        else:
+            await self._collect_sequential()
+
+    async def _collect_concurrent(self):
+        """
+        Each plugin is polled by its own supervised task. Readings are put into
+        a bounded queue, which is drained by a separate batch writer, so a slow
+        plugin no longer delays the others.
+        """
+        self._queue = BatchQueue(
+            self._save_batch,
+            maxsize=settings.collector.queue_size,
+            batch_size=settings.collector.batch_size,
+            flush_interval=settings.collector.flush_interval,
+        )
+        writer_task = asyncio.create_task(self._queue.run())
+        plugin_tasks = [
+            asyncio.create_task(
+                self._run_plugin(plugin), name=f"plugin:{plugin.device_id}"
+            )
+            for plugin in self.plugins
+        ]
+        try:
+            await asyncio.gather(*plugin_tasks)
+        except asyncio.CancelledError:
+            logger.info("DataCollector cancelled")
+        except Exception as e:
+            logger.error(f"Unexpected error in DataCollector: {e}", exc_info=True)
+        finally:
+            for task in [*plugin_tasks, writer_task]:
+                task.cancel()
+            await asyncio.gather(*plugin_tasks, writer_task, return_exceptions=True)
+            await self._queue.drain()
+            await self._cleanup()
+            logger.info("DataCollector stopped")
+
+    async def _run_plugin(self, plugin: DevicePlugin):
+        """
+        Supervises the plugin generator: restarts it after errors and stops
+        when the plugin finishes by itself (for example, it was disabled).
+        """
+        restart_delay = 1.0
+        while self._is_running:
+            try:
+                async for message in plugin.start():
+                    if message.value is None:
+                        message.value = await extract_numeric_value(message.data)
+                    await self._queue.put(message)
+                    restart_delay = 1.0
+                    if not self._is_running:
+                        break
+                logger.warning(f"{plugin.device_id} generator completed")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._log_exception(plugin.device_id, e)
+                logger.info(f"Restarting {plugin.device_id} in {restart_delay} s")
+                await asyncio.sleep(restart_delay)
+                restart_delay = min(restart_delay * 2, 60.0)
+
+    async def _save_batch(self, batch: List[SensorMessage]):
+        async with session_factory() as session:
+            count, _ = await asyncio.gather(
+                save_batch_to_db(session, batch), self._publisher.publish(batch)
+            )
+        logger.debug(f"Batch saved: {count} records")
+
+    async def _collect_sequential(self):
         plugin_generators = {}
         for plugin in self.plugins:
             try:
@@ -76,22 +152,6 @@ class DataCollector(BaseCollector):
                             if message.value is None:
                                 message.value = await extract_numeric_value(message.data)
                             self._batch.append(message)
-                            await asyncio.gather(
-                                publish_to_redis(self.redis_client, message),
-                                publish_with_retry(
-                                    self.mqtt_client,
-                                    f"gm/{message.device_id}/data",
-                                    message.data,
-                                    qos=1,
-                                ),
-                                publish_with_retry(
-                                    self.mqtt_client,
-                                    f"gm/{message.device_id}/online",
-                                    {"online": message.online},
-                                    qos=1,
-                                ),
-                                return_exceptions=True,
-                            )
                             data_received = True
 
                         except StopAsyncIteration:
@@ -120,14 +180,9 @@ class DataCollector(BaseCollector):
                 )
 
                 if batch_ready:
-                    count = await save_batch_to_db(
-                        self.db_session,
-                        self._batch,
-                        retention_days=settings.app_settings.keep_data,
-                    )
+                    await self._save_batch(self._batch)
                     self._batch = []
                     self._last_batch_check = now
-                    logger.debug(f"Batch saved: {count} records")
 
         except asyncio.CancelledError:
             logger.info("DataCollector cancelled")
@@ -135,9 +190,7 @@ class DataCollector(BaseCollector):
             logger.error(f"Unexpected error in DataCollector: {e}", exc_info=True)
         finally:
             if self._batch:
-                await save_batch_to_db(
-                    self.db_session, self._batch, settings.app_settings.keep_data
-                )
+                await self._save_batch(self._batch)
             await self._cleanup()
             logger.info("DataCollector stopped")
 
@@ -1,22 +1,24 @@
 import asyncio
-import json
 import logging
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional, Set
 
 import redis.asyncio as redis
 
 from core.settings import settings
 from crud.sensors import SensorDataCRUD
-from schemas.sensors import SensorMessage, SensoeUpdateSchema
+from db.database import session_factory
+from schemas.sensors import SensorMessage, SensorOnlineMessage
 from services.base_collector import BaseCollector
+from services.batch_queue import BatchQueue, QueueMessage
 from services.batch_saver import save_batch_to_db
 from services.mqtt_client import AsyncMQTTClient
 from services.mqtt_helper import (
     safe_unsubscribe,
     safe_subscribe,
 )
-from services.redis_publisher import publish_to_redis
+from services.redis_publisher import publish_many_to_redis
+from utils import codec
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +26,10 @@ logger = logging.getLogger(__name__)
 class MQTTCollector(BaseCollector):
     """
     Data collector from MQTT topics.
-    Subscribes to topics, parses messages and passes them to the handler.
+    Subscribes to topics, parses messages and puts readings and online
+    transitions into a bounded queue; the broker callback never touches the
+    database. A flusher task saves queued readings in batches, publishes them
+    to Redis and applies the online transitions of the batch.
     It does not publish data to MQTT (the devices do it themselves).
     """
 
@@ -36,10 +41,30 @@ class MQTTCollector(BaseCollector):
     ):
         super().__init__(mqtt_client=mqtt_client, redis_client=redis_client)
         self.subscription_topics = subscription_topics or ["devices/#"]
+        self._queue = BatchQueue(
+            self._flush,
+            maxsize=settings.collector.queue_size,
+            batch_size=settings.collector.batch_size,
+            flush_interval=settings.collector.flush_interval,
+        )
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._device_index: Dict[str, Set[str]] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of messages waiting to be saved."""
+        return self._queue.depth
+
+    @property
+    def dropped(self) -> int:
+        """Number of messages dropped because the queue was full."""
+        return self._queue.dropped
 
     async def collect(self):
         self._is_running = True
+        self._flusher_task = asyncio.create_task(self._queue.run())
         try:
+            await self._load_device_index()
             await self.mqtt_client.connect()
             for topic in self.subscription_topics:
                 success = await safe_subscribe(
@@ -62,50 +87,45 @@ class MQTTCollector(BaseCollector):
         finally:
             await self.mqtt_client.disconnect()
             logger.info("MQTT client disconnected")
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except asyncio.CancelledError:
+                pass
+            await self._queue.drain()
 
-    async def _on_message(self, topic: str, payload: bytes, qos: int, properties):
+    async def _on_message(
+        self, topic: str, payload: bytes, qos: int, properties, data: Any = None
+    ):
+        """
+        :param payload: raw message payload
+        :param data: payload already parsed by the MQTT client (None if it is not JSON)
+        """
         logger.debug(f"[MQTT] Received raw message: topic={topic}, size={len(payload)} B")
         device_id = self._extract_device_id(topic)
-        try:
-            payload_str = payload.decode("utf-8")
-        except UnicodeDecodeError as e:
-            logger.error(f"[MQTT] Failed to decode payload (topic={topic}): {e}")
-            return
         split_topic = topic.split("/")
         if "online" in split_topic:
-            try:
-                online = json.loads(payload_str).strip().lower() == "true"
-            except AttributeError as e:
-                online = payload_str
-            devices = await SensorDataCRUD.search(
-                pattern=device_id, session=self.db_session
-            )
-            if not devices:
+            online = self._parse_online(payload, data)
+            sensor_ids = self._device_index.get(device_id)
+            if not sensor_ids:
                 logger.warning(f"[MQTT] Cannot find device {device_id}")
                 return
-            for device in devices:
-                update_online = SensoeUpdateSchema(
-                    device_id=device,
-                    online=online,
-                    updated_at=datetime.now(),
+            for sensor_id in sensor_ids:
+                self._queue.put_nowait(
+                    SensorOnlineMessage(device_id=sensor_id, online=online)
                 )
+            return
+        try:
+            if data is None:
                 try:
-                    await SensorDataCRUD.update(
-                        data=update_online, session=self.db_session
-                    )
-                except Exception as e:
+                    data = codec.loads(payload)
+                except (ValueError, TypeError) as e:
                     logger.error(
-                        f"[MQTT] Unexpected error when try to update device state: {e}"
+                        f"[MQTT] Invalid JSON in payload (topic={topic}): {e}, raw={payload!r}"
                     )
-                    continue
-            return
-        try:
-            try:
-                data = json.loads(payload_str)
-            except json.JSONDecodeError as e:
-                logger.error(
-                    f"[MQTT] Invalid JSON in payload (topic={topic}): {e}, raw={payload_str}"
-                )
+                    return
+            if not isinstance(data, dict):
+                logger.error(f"[MQTT] Payload is not a JSON object (topic={topic})")
                 return
             if not device_id:
                 logger.warning(f"[MQTT] Cannot extract device_id from topic: {topic}")
@@ -114,26 +134,79 @@ class MQTTCollector(BaseCollector):
             for key, value in data.items():
                 if key == "online":
                     continue
+                sensor_id = f"{str(key.upper())}_{device_id}"
+                self._device_index.setdefault(device_id, set()).add(sensor_id)
                 message = SensorMessage(
-                    device_id=f"{str(key.upper())}_{device_id}",
-                    timestamp=datetime.now().isoformat(),
+                    device_id=sensor_id,
+                    timestamp=datetime.now().astimezone().isoformat(),
                     data=value,
                     value=value.get("value"),
                     unit=value.get("unit"),
                     online=True,
                 )
-                await asyncio.gather(
-                    publish_to_redis(self.redis_client, message),
-                    save_batch_to_db(
-                        self.db_session,
-                        [message],
-                        retention_days=settings.app_settings.keep_data,
-                    ),
-                )
-                logger.debug(f"[MQTT] Message successfully published to redis: {message}")
+                if self._queue.put_nowait(message):
+                    logger.debug(f"[MQTT] Message queued: {message.device_id}")
         except Exception as e:
             logger.critical(f"[MQTT] Unexpected error in _on_message: {e}", exc_info=True)
 
+    async def _flush(self, batch: List[QueueMessage]):
+        readings: List[SensorMessage] = []
+        online: Dict[str, bool] = {}
+        for message in batch:
+            if isinstance(message, SensorOnlineMessage):
+                online[message.device_id] = message.online
+                continue
+            # The reading is saved as online, overriding earlier transitions
+            online.pop(message.device_id, None)
+            readings.append(message)
+
+        async with session_factory() as session:
+            if readings:
+                await asyncio.gather(
+                    publish_many_to_redis(self.redis_client, readings),
+                    save_batch_to_db(session, readings),
+                )
+            # Transitions left after the last reading of their sensor,
+            # at most one UPDATE per state
+            for state in (True, False):
+                device_ids = [key for key, value in online.items() if value is state]
+                if device_ids:
+                    await SensorDataCRUD.set_online(
+                        device_ids=device_ids, online=state, session=session
+                    )
+        logger.debug(
+            f"[MQTT] Batch of {len(batch)} messages flushed, "
+            f"queue depth {self.queue_depth}, dropped {self.dropped}"
+        )
+
+    async def _load_device_index(self):
+        """
+        Builds the MQTT device id -> sensor ids index from the known sensors.
+        Sensors are named KEY_deviceid, so a sensor is indexed under every
+        suffix that follows an underscore.
+        """
+        async with session_factory() as session:
+            sensor_ids = await SensorDataCRUD.get_ids(session=session)
+        for sensor_id in sensor_ids:
+            parts = sensor_id.split("_")
+            for i in range(1, len(parts)):
+                self._device_index.setdefault("_".join(parts[i:]), set()).add(sensor_id)
+        logger.debug(f"[MQTT] Device index loaded: {len(self._device_index)} entries")
+
+    @staticmethod
+    def _parse_online(payload: bytes, data: Any = None) -> bool:
+        value = data
+        if value is None:
+            try:
+                value = payload.decode("utf-8")
+            except UnicodeDecodeError:
+                return False
+        if isinstance(value, dict):
+            value = value.get("online")
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "1", "on", "online")
+        return bool(value)
+
     def _extract_device_id(self, topic: str) -> Optional[str]:
         parts = topic.strip("/").split("/")
         if len(parts) >= 2:
@@ -1,22 +1,67 @@
 import os
+from typing import Dict, Literal, Union
+from urllib.parse import quote
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Database(BaseSettings):
+    driver: Literal["sqlite", "postgresql"] = "sqlite"
+    # SQLite
     database: str = "database.db"
     patch: str = os.path.join(
         os.path.dirname(os.path.abspath(__file__)), "..", "db", "base", database
     )
 
+    # PostgreSQL (asyncpg)
+    host: str = "127.0.0.1"
+    port: int = 5432
+    user: str = "postgres"
+    password: str = "postgres"
+    name: str = "gm"
+
+    # Keep payloads that {"value", "unit"} cannot reproduce in sensor_samples_raw
+    store_raw: bool = True
+
+    # SQLite profile: "default" keeps the SQLite defaults, "performance" applies
+    # the PRAGMAs below
+    profile: Literal["default", "performance"] = "performance"
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size: int = -64 * 1024  # negative value is in KiB
+    busy_timeout: int = 5000  # ms
+
     @property
     def url(self) -> str:
+        if self.driver == "postgresql":
+            return (
+                f"postgresql+asyncpg://{quote(self.user, safe='')}:"
+                f"{quote(self.password, safe='')}@{self.host}:{self.port}/{self.name}"
+            )
         return f"sqlite+aiosqlite:///{self.patch}"
 
+    @property
+    def pragmas(self) -> Dict[str, Union[str, int]]:
+        """PRAGMAs applied to every new SQLite connection."""
+        if self.driver != "sqlite" or self.profile != "performance":
+            return {}
+        return {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "mmap_size": self.mmap_size,
+            "cache_size": self.cache_size,
+            "temp_store": "MEMORY",
+            "busy_timeout": self.busy_timeout,
+        }
+
 
 class Collector(BaseSettings):
     mqtt: bool = True
     plugins: bool = True
+    concurrent: bool = True
+    queue_size: int = 1000
+    batch_size: int = 5
+    flush_interval: float = 2.0
+    max_in_flight: int = 16
 
 
 class Redis(BaseSettings):
@@ -46,6 +91,19 @@ class API(BaseSettings):
 
 class AppSettings(BaseSettings):
     keep_data: int = 7
+    # Points per history page: default and the largest limit a client may ask for
+    history_limit: int = 5000
+    history_max_limit: int = 50000
+    # Responses from this size (bytes) are gzipped for clients that accept it
+    gzip_min_size: int = 1024
+    gzip_level: int = 6
+
+
+class Retention(BaseSettings):
+    interval: int = 3600
+    chunk_size: int = 5000
+    devices: Dict[str, int] = {}
+    units: Dict[str, int] = {}
 
 
 class Settings(BaseSettings):
@@ -65,6 +123,7 @@ class Settings(BaseSettings):
     mqtt: MQTT
     app_settings: AppSettings
     collector: Collector
+    retention: Retention = Retention()
 
 
 settings = Settings()
@@ -12,6 +12,7 @@ from schemas.actuators import (
     ActuatorUpdate,
     ActuatorCommandCreate,
 )
+from services.response_cache import response_cache
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,7 @@ class ActuatorCRUD:
             )
             session.add(actuator_db)
             await session.commit()
+            response_cache.bump("actuators")
             return await ActuatorCRUD.get(actuator.device_id, session)
         except Exception as e:
             await session.rollback()
@@ -43,6 +45,7 @@ class ActuatorCRUD:
         try:
             await session.execute(stmt)
             await session.commit()
+            response_cache.bump("actuators")
             return await ActuatorCRUD.get(actuator.device_id, session)
         except Exception as e:
             await session.rollback()
@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.layouts import Layout as LayoutModel
 from schemas.layouts import LayoutSchema
+from services.response_cache import response_cache
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +35,7 @@ class Layout:
                 await session.execute(stmt)
 
             await session.commit()
+            response_cache.bump("layouts")
 
             return layout
 
@@ -5,9 +5,10 @@ from fastapi import HTTPException
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.database import async_session_context
 from models.plugins import PluginRegistry
 from schemas.plugins import PluginReadSchema, PluginUpdateSchema, PluginBaseSchema
+from services.plugin_state import plugin_state
+from services.response_cache import response_cache
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +25,11 @@ class Plugins:
                 plugin_db,
             )
             await session.commit()
-            return await Plugins.get(module_name=plugin.module_name, session=session)
+            response_cache.bump("plugins")
+            result = await Plugins.get(module_name=plugin.module_name, session=session)
+            if result:
+                plugin_state.set(result.device_id, result.is_running)
+            return result
         except Exception as e:
             await session.rollback()
             logger.error(e)
@@ -43,12 +48,15 @@ class Plugins:
         try:
             await session.execute(stmt)
             await session.commit()
+            response_cache.bump("plugins")
             result = await session.execute(
                 select(PluginRegistry).where(PluginRegistry.id == data.id)
             )
-            return PluginReadSchema.model_validate(
+            plugin = PluginReadSchema.model_validate(
                 result.scalars().first(), from_attributes=True
             )
+            plugin_state.set(plugin.device_id, plugin.is_running)
+            return plugin
         except Exception as e:
             await session.rollback()
             logger.error(e)
@@ -83,12 +91,3 @@ class Plugins:
             await session.rollback()
             logger.error(e)
             raise HTTPException(status_code=400, detail="Plugins not found")
-
-    @staticmethod
-    async def is_running(device_id: str) -> bool:
-        stmt = select(PluginRegistry.is_running).where(
-            PluginRegistry.device_id == device_id
-        )
-        async with async_session_context() as session:
-            result = await session.execute(stmt)
-            return result.scalar_one_or_none()
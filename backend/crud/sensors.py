@@ -1,22 +1,48 @@
+import base64
+import csv
 import datetime
-import json
+import io
 import logging
-from typing import List, Optional
+from array import array
+from typing import AsyncIterator, Iterable, List, NamedTuple, Optional, Tuple
 
 from fastapi import HTTPException
 from pydantic import ValidationError
-from sqlalchemy import delete, select, and_, func, update
+from sqlalchemy import ColumnElement, Table, delete, select, func, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import SensorData, Sensor
+from db import rollups
+from db.database import async_session_context
+from db.partitions import partition_router
+from models import Sensor, SensorLatest, SensorRollup, SensorSample
 from schemas.sensors import (
     SensorReadSchema,
     SensoeUpdateSchema,
+    SensorBucketReadSchema,
     SensorDataReadSchema,
+    SensorHistoryPage,
+    SensorHistoryPoint,
+    SensorSeries,
 )
+from services.response_cache import response_cache
+from utils import codec, downsample
+from utils.helpers import from_epoch_ms, to_epoch_ms
 
 logger = logging.getLogger(__name__)
 
+EXPORT_COLUMNS = ("device_id", "timestamp", "value", "unit")
+# Keys of the fast-path JSON rows, in the order the schemas serialize them
+HISTORY_FIELDS = tuple(SensorDataReadSchema.model_fields)
+BUCKET_FIELDS = tuple(SensorBucketReadSchema.model_fields)
+SENSOR_FIELDS = tuple(SensorReadSchema.model_fields)
+
+
+class HistoryRows(NamedTuple):
+    unit: Optional[str]
+    resolution: Optional[int]
+    rows: List[tuple]
+    next_cursor: Optional[str]
+
 
 class SensorDataCRUD:
 
@@ -34,6 +60,7 @@ class SensorDataCRUD:
             )
             await session.execute(update_stmt)
             await session.commit()
+            response_cache.bump("sensors")
 
             return await SensorDataCRUD.get(data.device_id, session)
 
@@ -48,6 +75,7 @@ class SensorDataCRUD:
             stmt = update(Sensor).values(online=False)
             await session.execute(stmt)
             await session.commit()
+            response_cache.bump("sensors")
             logger.info("All devices set to offline successfully")
 
         except Exception as e:
@@ -68,35 +96,35 @@ class SensorDataCRUD:
         await session.execute(update_stmt)
 
     @staticmethod
-    async def cleanup_old_data(
-        session: AsyncSession, device_id: str, retention_days: int
-    ):
-        cutoff = datetime.datetime.now() - datetime.timedelta(days=retention_days)
-        stmt = delete(SensorData).where(
-            SensorData.device_id == device_id, SensorData.timestamp < cutoff
-        )
-        await session.execute(stmt)
+    async def delete_expired(
+        session: AsyncSession,
+        table: Table,
+        cutoff: int,
+        limit: int,
+        *criteria: ColumnElement[bool],
+    ) -> int:
+        """
+        Deletes at most `limit` records older than cutoff (epoch ms) from a
+        history table (a day partition, sensor_samples_raw or sensor_rollups)
+        and commits. Rollups go only once their whole bucket is older.
+        Used by the retention job to expire history in bounded chunks.
+        """
+        if table is SensorRollup.__table__:
+            expired = rollups.ended_before(table.c, cutoff)
+            key = (table.c.sensor_id, table.c.resolution, table.c.ts)
+        else:
+            expired = table.c.ts < cutoff
+            key = (table.c.sensor_id, table.c.ts)
+        keys = select(*key).where(expired, *criteria).limit(limit)
+        result = await session.execute(delete(table).where(tuple_(*key).in_(keys)))
+        await session.commit()
+        return result.rowcount
 
     @staticmethod
     async def get_all(session: AsyncSession) -> List[SensorReadSchema]:
-        subq = (
-            select(
-                SensorData.device_id,
-                func.max(SensorData.timestamp).label("max_timestamp"),
-            )
-            .group_by(SensorData.device_id)
-            .subquery()
-        )
         stmt = (
-            select(Sensor, SensorData)
-            .join(
-                SensorData,
-                and_(
-                    Sensor.device_id == SensorData.device_id,
-                    SensorData.timestamp == subq.c.max_timestamp,
-                ),
-            )
-            .outerjoin(subq, SensorData.device_id == subq.c.device_id)
+            select(Sensor, SensorLatest.ts)
+            .join(SensorLatest, SensorLatest.sensor_id == Sensor.id)
             .order_by(Sensor.created_at.desc())
         )
 
@@ -107,12 +135,12 @@ class SensorDataCRUD:
             if not rows:
                 return []
 
-            # 3. Формируем ответ: Device + последняя DeviceData
+            # 3. Формируем ответ: Device + время последнего замера
             devices = []
-            for device, data in rows:
-                # Создаём dict на основе Device, добавляем timestamp из DeviceData
+            for device, max_ts in rows:
+                # Создаём dict на основе Device, добавляем timestamp последнего замера
                 device_dict = device.__dict__.copy()
-                device_dict["timestamp"] = data.timestamp if data else None
+                device_dict["timestamp"] = from_epoch_ms(max_ts)
                 # Валидируем через Pydantic
                 devices.append(
                     SensorReadSchema.model_validate(device_dict, from_attributes=True)
@@ -126,28 +154,56 @@ class SensorDataCRUD:
             raise HTTPException(status_code=400, detail="No data found") from e
 
     @staticmethod
-    async def get(device_id: str, session: AsyncSession) -> SensorReadSchema:
-        subq = (
+    async def get_all_json(session: AsyncSession) -> bytes:
+        """
+        JSON of get_all built straight from the selected columns, without
+        loading ORM objects or validating a schema per sensor.
+        """
+        stmt = (
             select(
-                SensorData.device_id,
-                func.max(SensorData.timestamp).label("max_timestamp"),
+                Sensor.device_id,
+                Sensor.name,
+                Sensor.description,
+                Sensor.id,
+                Sensor.created_at,
+                Sensor.updated_at,
+                SensorLatest.ts,
+                Sensor.online,
             )
-            .group_by(SensorData.device_id)
-            .subquery()
+            .join(SensorLatest, SensorLatest.sensor_id == Sensor.id)
+            .order_by(Sensor.created_at.desc())
         )
-
-        stmt = (
-            select(Sensor, SensorData)
-            .join(
-                SensorData,
-                and_(
-                    Sensor.device_id == SensorData.device_id,
-                    SensorData.timestamp == subq.c.max_timestamp,
+        try:
+            result = await session.execute(stmt)
+            return codec.dumps_rows(
+                SENSOR_FIELDS,
+                (
+                    (
+                        row.device_id.strip(),
+                        row.name.strip(),
+                        row.description.strip() if row.description is not None else None,
+                        row.id,
+                        row.created_at,
+                        row.updated_at,
+                        from_epoch_ms(row.ts),
+                        None,
+                        None,
+                        row.online,
+                    )
+                    for row in result
                 ),
             )
-            .outerjoin(subq, SensorData.device_id == subq.c.device_id)
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Error fetching devices with latest data: {e}")
+            raise HTTPException(status_code=400, detail="No data found") from e
+
+    @staticmethod
+    async def get(device_id: str, session: AsyncSession) -> SensorReadSchema:
+        stmt = (
+            select(Sensor, SensorLatest)
+            .join(SensorLatest, SensorLatest.sensor_id == Sensor.id)
             .where(Sensor.device_id == device_id)
-            .order_by(Sensor.created_at.desc())
         )
 
         result = await session.execute(stmt)
@@ -156,15 +212,16 @@ class SensorDataCRUD:
             await session.rollback()
             raise HTTPException(status_code=404, detail="Device not found")
 
-        sensor, sensor_data = row
-        print(sensor)
+        sensor, sample = row
         data_dict = {}
-        if sensor_data:
+        if sample:
             try:
-                if isinstance(sensor_data.data, str):
-                    data_dict = json.loads(sensor_data.data)
-                    data_dict["unit"] = sensor_data.unit
-            except (json.JSONDecodeError, TypeError) as e:
+                if isinstance(sample.data, str):
+                    data_dict = codec.loads(sample.data)
+                    data_dict["unit"] = sensor.unit
+                else:
+                    data_dict = SensorSample.payload(sample.value, sensor.unit)
+            except (ValueError, TypeError) as e:
                 logger.error(f"Failed to parse sensor_data: {e}")
                 raise HTTPException(status_code=500, detail="Invalid sensor data format")
 
@@ -176,8 +233,8 @@ class SensorDataCRUD:
             "description": sensor.description,
             "created_at": sensor.created_at,
             "updated_at": sensor.updated_at,
-            "timestamp": (sensor_data.timestamp if sensor_data else None),
-            "value": sensor_data.value if sensor_data else None,
+            "timestamp": (from_epoch_ms(sample.ts) if sample else None),
+            "value": sample.value if sample else None,
             "details": data_dict,
             "online": True,
         }
@@ -203,12 +260,63 @@ class SensorDataCRUD:
             logger.error(f"Error fetching devices: {e}")
 
     @staticmethod
-    async def get_av_value(measure_unit: str, session: AsyncSession) -> Optional[float]:
-        stmt = select(func.avg(SensorData.value)).where(SensorData.unit == measure_unit)
+    async def get_ids(session: AsyncSession) -> List[str]:
+        result = await session.execute(select(Sensor.device_id))
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def set_online(
+        device_ids: Iterable[str], online: bool, session: AsyncSession
+    ) -> int:
+        """Sets the online flag for several sensors with a single UPDATE."""
+        stmt = (
+            update(Sensor)
+            .where(Sensor.device_id.in_(list(device_ids)))
+            .values(online=online, updated_at=datetime.datetime.now())
+        )
+        try:
+            result = await session.execute(stmt)
+            await session.commit()
+            response_cache.bump("sensors")
+            return result.rowcount
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Error updating online state: {e}")
+            return 0
+
+    @staticmethod
+    async def get_av_value(
+        measure_unit: str,
+        session: AsyncSession,
+        window: Optional[datetime.timedelta] = None,
+    ) -> Optional[float]:
+        """
+        Average value of the sensors with the given unit: over their latest
+        readings (sensor_latest) or, with a window, over the readings of the
+        last `window` taken from the rollups, starting at a bucket boundary.
+        """
+        if window is None:
+            stmt = (
+                select(func.avg(SensorLatest.value))
+                .join(Sensor, Sensor.id == SensorLatest.sensor_id)
+                .where(Sensor.unit == measure_unit)
+            )
+        else:
+            resolution = rollups.window_resolution(int(window.total_seconds()))
+            start_ms = to_epoch_ms(datetime.datetime.now(datetime.timezone.utc) - window)
+            stmt = (
+                select(func.sum(SensorRollup.total) / func.sum(SensorRollup.count))
+                .join(Sensor, Sensor.id == SensorRollup.sensor_id)
+                .where(
+                    Sensor.unit == measure_unit,
+                    SensorRollup.resolution == resolution,
+                    SensorRollup.ts >= rollups.bucket_of(start_ms, resolution),
+                )
+            )
         try:
             result = await session.execute(stmt)
             data = result.scalar()
-            return float(data) if data else None
+            return float(data) if data is not None else None
         except Exception as e:
             await session.rollback()
             logger.error(f"Error fetching av value: {e}")
@@ -216,9 +324,9 @@ class SensorDataCRUD:
     @staticmethod
     async def get_value(device_id: str, session: AsyncSession) -> Optional[float]:
         stmt = (
-            select(SensorData.value)
-            .where(SensorData.device_id == device_id)
-            .order_by(SensorData.timestamp.desc())
+            select(SensorLatest.value)
+            .join(Sensor, Sensor.id == SensorLatest.sensor_id)
+            .where(Sensor.device_id == device_id)
         )
         try:
             result = await session.execute(stmt)
@@ -234,38 +342,412 @@ class SensorDataCRUD:
     async def get_history(
         session: AsyncSession,
         device_id: str,
-    ) -> List[SensorDataReadSchema]:
-        stmt = (
-            select(
-                SensorData.device_id,
-                SensorData.timestamp,
-                SensorData.value,
-                SensorData.unit,
-            )
-            .where(SensorData.device_id == device_id)
-            .order_by(SensorData.timestamp.desc())
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+        max_points: Optional[int] = None,
+    ) -> List[SensorHistoryPoint]:
+        """Whole history of a sensor in [start, end), newest first."""
+        page = await SensorDataCRUD.get_history_page(
+            session, device_id, start=start, end=end, max_points=max_points
         )
-        try:
-            result = await session.execute(stmt)
-            rows = result.all()  # Возвращает список кортежей
+        return page.items
 
-            if not rows:
-                return []
+    @staticmethod
+    async def get_history_page(
+        session: AsyncSession,
+        device_id: str,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        max_points: Optional[int] = None,
+    ) -> SensorHistoryPage:
+        """One page of the history of a sensor as schemas (see get_history_rows)."""
+        history = await SensorDataCRUD.get_history_rows(
+            session, device_id, start, end, limit, cursor, max_points
+        )
+        schema = (
+            SensorDataReadSchema if history.resolution is None else SensorBucketReadSchema
+        )
+        return SensorHistoryPage(
+            items=[
+                schema(
+                    device_id=device_id,
+                    timestamp=from_epoch_ms(row[0]),
+                    value=row[1],
+                    unit=history.unit,
+                    **dict(zip(("min", "max", "count"), row[2:])),
+                )
+                for row in history.rows
+            ],
+            next_cursor=history.next_cursor,
+            resolution=history.resolution,
+        )
+
+    @staticmethod
+    def history_json(device_id: str, history: HistoryRows) -> bytes:
+        """
+        JSON of a list of SensorHistoryPoint built straight from the rows,
+        without a model per point. min, max and count are written only for
+        rollup buckets.
+        """
+        unit = history.unit
+        return codec.dumps_rows(
+            HISTORY_FIELDS if history.resolution is None else BUCKET_FIELDS,
+            (
+                (device_id, from_epoch_ms(ts), value, unit, *bucket)
+                for ts, value, *bucket in history.rows
+            ),
+        )
 
-            validated_data = []
-            for row in rows:
-                # row — это кортеж (device_id, timestamp, value, unit)
-                schema = SensorDataReadSchema(
-                    device_id=row[0],
-                    timestamp=row[1],
-                    value=row[2],
-                    unit=row[3],
+    @staticmethod
+    async def get_history_rows(
+        session: AsyncSession,
+        device_id: str,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        max_points: Optional[int] = None,
+    ) -> HistoryRows:
+        """
+        One page of the history of a sensor, newest first, as row tuples
+        (ts, value) for raw samples or (ts, value, min, max, count) for
+        rollup buckets.
+
+        Keyset pagination over the (sensor_id, ts) primary key: the cursor
+        holds the resolution and the ts of the last returned point, and the
+        next page continues strictly below it, so every page costs the same
+        however deep it is. Raw samples are read partition by partition from
+        the newest one until the page is full.
+        With max_points, a range whose raw samples do not fit the budget is
+        read from the finest rollup (minute, hour, day) that does, and every
+        point is a bucket with its average, min, max and count. The budget
+        leaves LTTB OVERSAMPLE candidates per point, and the page is then
+        downsampled to max_points with LTTB before any schema is built.
+
+        :param limit: maximum number of points on the page (None — no limit)
+        :param cursor: next_cursor of the previous page
+        :raises HTTPException: 400 if the cursor is invalid
+        """
+        start_ms = to_epoch_ms(start) if start is not None else None
+        end_ms = to_epoch_ms(end) if end is not None else None
+        resolution = None
+        if cursor is not None:
+            resolution, after = SensorDataCRUD._decode_cursor(cursor)
+            end_ms = after if end_ms is None else min(end_ms, after)
+        try:
+            sensor = (
+                await session.execute(
+                    select(Sensor.id, Sensor.unit).where(Sensor.device_id == device_id)
+                )
+            ).first()
+            if sensor is None:
+                return HistoryRows(None, None, [], None)
+            sensor_id, unit = sensor
+
+            if cursor is None and max_points is not None:
+                budget = max_points * downsample.OVERSAMPLE
+                resolution = await SensorDataCRUD._history_resolution(
+                    session, [sensor_id], start_ms, end_ms, budget
+                )
+            fetch = limit + 1 if limit is not None else None
+            if resolution is not None:
+                stmt = (
+                    select(
+                        SensorRollup.ts,
+                        SensorRollup.total / SensorRollup.count,
+                        SensorRollup.min,
+                        SensorRollup.max,
+                        SensorRollup.count,
+                    )
+                    .where(
+                        SensorRollup.sensor_id == sensor_id,
+                        SensorRollup.resolution == resolution,
+                    )
+                    .order_by(SensorRollup.ts.desc())
+                    .limit(fetch)
+                )
+                if start_ms is not None:
+                    stmt = stmt.where(
+                        SensorRollup.ts >= rollups.bucket_of(start_ms, resolution)
+                    )
+                if end_ms is not None:
+                    stmt = stmt.where(SensorRollup.ts < end_ms)
+                rows = (await session.execute(stmt)).all()
+            else:
+                rows = []
+                tables = partition_router.tables(session, start_ms, end_ms)
+                for table in reversed(tables):
+                    stmt = (
+                        select(table.c.ts, table.c.value)
+                        .where(table.c.sensor_id == sensor_id)
+                        .order_by(table.c.ts.desc())
+                    )
+                    if start_ms is not None:
+                        stmt = stmt.where(table.c.ts >= start_ms)
+                    if end_ms is not None:
+                        stmt = stmt.where(table.c.ts < end_ms)
+                    if fetch is not None:
+                        stmt = stmt.limit(fetch - len(rows))
+                    rows.extend((await session.execute(stmt)).all())
+                    if fetch is not None and len(rows) >= fetch:
+                        break
+
+            next_cursor = None
+            if limit is not None and len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = SensorDataCRUD._encode_cursor(resolution, rows[-1][0])
+            if max_points is not None and len(rows) > max_points:
+                rows = [row for row in rows if row[1] is not None]
+                keep = downsample.lttb(
+                    array("d", (row[0] for row in rows)),
+                    array("d", (row[1] for row in rows)),
+                    max_points,
                 )
-                validated_data.append(schema)
+                rows = [rows[i] for i in keep]
 
-            return validated_data
+            return HistoryRows(unit, resolution, rows, next_cursor)
 
         except Exception as e:
             await session.rollback()
             logger.error(f"Error fetching history: {e}")
             raise HTTPException(status_code=500, detail="Internal server error") from e
+
+    @staticmethod
+    async def get_history_batch(
+        session: AsyncSession,
+        device_ids: List[str],
+        max_points: int,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+    ) -> List[SensorSeries]:
+        """
+        History of several sensors in [start, end) as columns, oldest first.
+
+        All sensors are read together at one resolution: raw samples, one
+        query per day partition of the window, while the busiest sensor fits
+        the max_points budget (with LTTB oversampling), otherwise the rollup
+        picked for it in one query. Every series is
+        then downsampled to max_points with LTTB. Unknown device ids are
+        skipped.
+        """
+        start_ms = to_epoch_ms(start) if start is not None else None
+        end_ms = to_epoch_ms(end) if end is not None else None
+        try:
+            result = await session.execute(
+                select(Sensor.id, Sensor.device_id, Sensor.unit).where(
+                    Sensor.device_id.in_(device_ids)
+                )
+            )
+            sensors = {
+                sensor_id: (device_id, unit) for sensor_id, device_id, unit in result
+            }
+            if not sensors:
+                return []
+
+            resolution = await SensorDataCRUD._history_resolution(
+                session,
+                list(sensors),
+                start_ms,
+                end_ms,
+                max_points * downsample.OVERSAMPLE,
+            )
+            if resolution is not None:
+                if start_ms is not None:
+                    start_ms = rollups.bucket_of(start_ms, resolution)
+                sources = [
+                    (
+                        SensorRollup.__table__.c,
+                        SensorRollup.total / SensorRollup.count,
+                        [SensorRollup.resolution == resolution],
+                    )
+                ]
+            else:
+                # Only the partitions overlapping the window, oldest first
+                sources = [
+                    (table.c, table.c.value, [])
+                    for table in partition_router.tables(session, start_ms, end_ms)
+                ]
+
+            columns = {sensor: (array("q"), []) for sensor in sensors}
+            for c, value, criteria in sources:
+                stmt = (
+                    select(c.sensor_id, c.ts, value)
+                    .where(c.sensor_id.in_(list(sensors)), *criteria)
+                    .order_by(c.sensor_id, c.ts)
+                )
+                if start_ms is not None:
+                    stmt = stmt.where(c.ts >= start_ms)
+                if end_ms is not None:
+                    stmt = stmt.where(c.ts < end_ms)
+                for sensor, moment, point in await session.execute(stmt):
+                    timestamps, values = columns[sensor]
+                    timestamps.append(moment)
+                    values.append(point)
+
+            series = {}
+            for sensor, (timestamps, values) in columns.items():
+                if len(timestamps) > max_points:
+                    kept = [i for i, value in enumerate(values) if value is not None]
+                    keep = downsample.lttb(
+                        array("d", (timestamps[i] for i in kept)),
+                        array("d", (values[i] for i in kept)),
+                        max_points,
+                    )
+                    timestamps = [timestamps[kept[i]] for i in keep]
+                    values = [values[kept[i]] for i in keep]
+                device_id, unit = sensors[sensor]
+                series[device_id] = SensorSeries(
+                    device_id=device_id,
+                    unit=unit,
+                    resolution=resolution,
+                    timestamps=list(timestamps),
+                    values=values,
+                )
+            return [series[device_id] for device_id in device_ids if device_id in series]
+
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Error fetching history batch: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error") from e
+
+    @staticmethod
+    async def export_history(
+        session: AsyncSession,
+        device_id: str,
+        fmt: str,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+        chunk_rows: int = 5000,
+    ) -> AsyncIterator[bytes]:
+        """
+        Export of the history of a sensor in [start, end), oldest first.
+        The sensor is looked up in the request session, the rows are read by
+        the returned generator in a session of its own (the request one is
+        closed before a streaming body is sent).
+
+        :param fmt: 'ndjson' or 'csv'
+        :param chunk_rows: rows per server-side cursor fetch and per chunk
+        :return: async iterator of encoded chunks
+        :raises HTTPException: 404 if the sensor does not exist
+        """
+        sensor = (
+            await session.execute(
+                select(Sensor.id, Sensor.unit).where(Sensor.device_id == device_id)
+            )
+        ).first()
+        if sensor is None:
+            raise HTTPException(status_code=404, detail="Device not found")
+        return SensorDataCRUD._export_chunks(
+            sensor.id,
+            device_id,
+            sensor.unit,
+            fmt,
+            to_epoch_ms(start) if start is not None else None,
+            to_epoch_ms(end) if end is not None else None,
+            chunk_rows,
+        )
+
+    @staticmethod
+    async def _export_chunks(
+        sensor_id: int,
+        device_id: str,
+        unit: Optional[str],
+        fmt: str,
+        start_ms: Optional[int],
+        end_ms: Optional[int],
+        chunk_rows: int,
+    ) -> AsyncIterator[bytes]:
+        """
+        Streams the partitions one after another through server-side cursors
+        (Session.stream with yield_per), so memory stays bounded by
+        chunk_rows whatever the size of the export.
+        """
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            yield buffer.getvalue().encode()
+
+        async with async_session_context() as session:
+            for table in partition_router.tables(session, start_ms, end_ms):
+                stmt = (
+                    select(table.c.ts, table.c.value)
+                    .where(table.c.sensor_id == sensor_id)
+                    .order_by(table.c.ts)
+                    .execution_options(yield_per=chunk_rows)
+                )
+                if start_ms is not None:
+                    stmt = stmt.where(table.c.ts >= start_ms)
+                if end_ms is not None:
+                    stmt = stmt.where(table.c.ts < end_ms)
+                result = await session.stream(stmt)
+                async for rows in result.partitions():
+                    rows = [
+                        (device_id, from_epoch_ms(ts).isoformat(), value, unit)
+                        for ts, value in rows
+                    ]
+                    if fmt == "csv":
+                        buffer.seek(0)
+                        buffer.truncate()
+                        writer.writerows(rows)
+                        yield buffer.getvalue().encode()
+                    else:
+                        yield b"".join(
+                            codec.dumps(dict(zip(EXPORT_COLUMNS, row))) + b"\n"
+                            for row in rows
+                        )
+
+    @staticmethod
+    def _encode_cursor(resolution: Optional[int], ts: int) -> str:
+        raw = f"{resolution or 0}:{ts}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[Optional[int], int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            resolution, ts = (int(part) for part in raw.split(":"))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail="Invalid cursor") from e
+        if resolution and resolution not in rollups.RESOLUTIONS:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return resolution or None, ts
+
+    @staticmethod
+    async def _history_resolution(
+        session: AsyncSession,
+        sensor_ids: List[int],
+        start_ms: Optional[int],
+        end_ms: Optional[int],
+        budget: int,
+    ) -> Optional[int]:
+        """
+        Picks the rollup resolution of a history request (None for raw
+        samples). The number of raw samples in the range is estimated from
+        the hourly rollup counts, an open start is the oldest stored hour.
+        With several sensors the one with the most samples decides.
+        """
+        hour = rollups.ESTIMATE_RESOLUTION
+        stmt = (
+            select(func.sum(SensorRollup.count), func.min(SensorRollup.ts))
+            .where(
+                SensorRollup.sensor_id.in_(sensor_ids),
+                SensorRollup.resolution == hour,
+            )
+            .group_by(SensorRollup.sensor_id)
+        )
+        if start_ms is not None:
+            stmt = stmt.where(SensorRollup.ts >= rollups.bucket_of(start_ms, hour))
+        if end_ms is not None:
+            stmt = stmt.where(SensorRollup.ts < end_ms)
+        counts = (await session.execute(stmt)).all()
+        if not counts:
+            return None
+        samples = max(count for count, _ in counts)
+        oldest = min(ts for _, ts in counts)
+        if end_ms is None:
+            end_ms = to_epoch_ms(datetime.datetime.now(datetime.timezone.utc))
+        span = end_ms - (start_ms if start_ms is not None else oldest)
+        return rollups.pick_resolution(span, samples, budget)
@@ -1,9 +1,11 @@
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Dict, Optional
 
-from sqlalchemy import AsyncAdaptedQueuePool
+from sqlalchemy import AsyncAdaptedQueuePool, event, text
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
+    AsyncEngine,
     AsyncSession,
     AsyncAttrs,
     async_sessionmaker,
@@ -18,19 +20,86 @@ class Base(AsyncAttrs, DeclarativeBase):
     __abstract__ = True
 
 
+class PoolStats:
+    """Checkout counters of the connection pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that measures how long every checkout waits for a connection
+    (including opening a new one).
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record(time.perf_counter() - started)
+
+
 DATABASE_URL = settings.database.url
 
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
-    poolclass=AsyncAdaptedQueuePool,
+    poolclass=InstrumentedPool,
 )
 
+# Single factory for the whole process. Background components open a short
+# session per unit of work with `async with session_factory() as session:`
+session_factory = async_sessionmaker(
+    bind=engine, expire_on_commit=False, class_=AsyncSession
+)
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        # Switching to WAL writes the header of a new database file, after which
+        # auto_vacuum can no longer be changed, so it has to be set first
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        for name, value in settings.database.pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+if engine.dialect.name == "sqlite" and settings.database.pragmas:
+    event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    log.debug(f"SQLite profile '{settings.database.profile}' enabled")
+
+
+def pool_status() -> Dict[str, float]:
+    """Current state of the connection pool and checkout wait times."""
+    pool = engine.pool
+    checkouts = pool_stats.checkouts
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": checkouts,
+        "wait_avg_ms": pool_stats.wait_total / checkouts * 1000 if checkouts else 0.0,
+        "wait_max_ms": pool_stats.wait_max * 1000,
+    }
+
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    factory = async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
     log.debug("Session opened")
-    async with factory() as session:
+    async with session_factory() as session:
         try:
             yield session
             await session.commit()
@@ -56,8 +125,26 @@ async def async_session_context():
             await session.close()
 
 
-async def init_db():
-    async with engine.begin() as conn:
+async def init_db(bind: Optional[AsyncEngine] = None):
+    """:param bind: engine to initialize instead of the application one (tests)"""
+    async with (bind or engine).begin() as conn:
         log.info("Initializing database")
-        await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == "sqlite":
+            # Takes effect only for a new (empty) database file
+            await conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        # Partitioned tables exist only on PostgreSQL, on SQLite the router
+        # creates day tables and a view instead
+        tables = [
+            table
+            for table in Base.metadata.sorted_tables
+            if conn.dialect.name == "postgresql" or not table.info.get("partitioned")
+        ]
+        await conn.run_sync(Base.metadata.create_all, tables=tables)
+
+        from db import rollups, sensor_latest
+        from db.partitions import partition_router
+
+        await partition_router.setup(conn)
+        await rollups.backfill(conn)
+        await sensor_latest.backfill(conn)
         log.debug("Database initialized")
@@ -0,0 +1,480 @@
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    Table,
+    event,
+    inspect,
+    select,
+    text,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.schema import CreateTable
+
+from core.settings import settings
+from models import Sensor, SensorSample, SensorSampleRaw
+from utils.helpers import DAY_MS, EPOCH
+
+logger = logging.getLogger(__name__)
+
+Executor = Union[AsyncSession, AsyncConnection]
+Key = Tuple[int, int]
+Value = Optional[float]
+
+PARENT = SensorSample.__tablename__
+COLUMNS = ("sensor_id", "ts", "value")
+_NAME_RE = re.compile(rf"^{PARENT}_(\d{{8}})$")
+# SQLite allows at most 500 terms in a compound SELECT
+VIEW_TERMS = 500
+# (sensor_id, ts) pairs per lookup of the stored samples
+STORED_CHUNK = 500
+
+# History layout used before sensor_samples: a wide sensors_data table
+# (or a view over its day tables sensors_data_YYYYMMDD on SQLite)
+LEGACY = "sensors_data"
+_LEGACY_NAME_RE = re.compile(rf"^{LEGACY}_(\d{{8}}|legacy)$")
+
+
+def partition_name(day: date) -> str:
+    return f"{PARENT}_{day:%Y%m%d}"
+
+
+def day_bounds(day: date) -> Tuple[int, int]:
+    """[start, end) of a UTC day in epoch milliseconds."""
+    start = (day - EPOCH.date()).days * DAY_MS
+    return start, start + DAY_MS
+
+
+def day_of(ts: int) -> date:
+    return EPOCH.date() + timedelta(days=ts // DAY_MS)
+
+
+def _dialect(executor: Executor) -> str:
+    if isinstance(executor, AsyncSession):
+        return executor.bind.dialect.name
+    return executor.dialect.name
+
+
+def _upsert_samples():
+    """Upsert of samples into the partitioned sensor_samples (PostgreSQL)."""
+    stmt = postgresql_insert(SensorSample)
+    return stmt.on_conflict_do_update(
+        index_elements=["sensor_id", "ts"], set_={"value": stmt.excluded.value}
+    )
+
+
+def _on_commit(executor: Executor, callback: Callable[[], None]) -> None:
+    """
+    Calls callback once the current transaction of executor commits.
+    A rollback discards it: the DDL of the transaction is gone as well.
+    """
+    if isinstance(executor, AsyncSession):
+        target, commit, rollback = executor.sync_session, "after_commit", "after_rollback"
+    else:
+        target, commit, rollback = executor.sync_connection, "commit", "rollback"
+    pending = [callback]
+
+    def on_commit(*args) -> None:
+        if pending:
+            pending.pop()()
+
+    def on_rollback(*args) -> None:
+        pending.clear()
+
+    event.listen(target, commit, on_commit, once=True)
+    event.listen(target, rollback, on_rollback, once=True)
+
+
+class PartitionRouter:
+    """
+    Day partitions of the sensor_samples history.
+
+    PostgreSQL: sensor_samples is a table partitioned by RANGE (ts),
+    the router creates the partition of every day before rows arrive and
+    the planner prunes partitions by itself.
+
+    SQLite: every day is a separate WITHOUT ROWID table sensor_samples_YYYYMMDD
+    in the same database file (ATTACH is limited to 10 databases by default),
+    and sensor_samples is a UNION ALL view over them (over views of up to
+    VIEW_TERMS partitions each once there are more). Inserts and range reads
+    go straight to the partitions overlapping the requested window.
+
+    Expiring history drops whole partitions instead of deleting rows.
+    The list of partitions changes only when the transaction that created or
+    dropped them commits.
+    """
+
+    def __init__(self):
+        self._days: Set[date] = set()
+        self._tables: Dict[date, Table] = {}
+        self._metadata = MetaData()
+        self.loaded = False
+
+    def reset(self) -> None:
+        self._days.clear()
+        self.loaded = False
+
+    @property
+    def days(self) -> List[date]:
+        return sorted(self._days)
+
+    async def setup(self, conn: AsyncConnection) -> None:
+        """
+        Called by init_db after create_all: loads the list of partitions and
+        moves the history of the previous sensors_data layout into them.
+        """
+        await self._upgrade_sensors(conn)
+        await self.load(conn)
+        legacy = await self._legacy_kind(conn)
+        if legacy:
+            await self._migrate_legacy(conn, legacy)
+        elif _dialect(conn) == "sqlite":
+            await self._rebuild_view(conn)
+
+    async def load(self, executor: Executor) -> None:
+        self._days = {
+            datetime.strptime(match.group(1), "%Y%m%d").date()
+            for match in map(_NAME_RE.match, await self._table_names(executor, PARENT))
+            if match
+        }
+        self.loaded = True
+        logger.debug(f"History partitions loaded: {len(self._days)}")
+
+    async def ensure(self, executor: Executor, days: Iterable[date]) -> None:
+        """Creates the partitions of the given days that do not exist yet."""
+        if not self.loaded:
+            await self.load(executor)
+        missing = set(days) - self._days
+        if not missing:
+            return
+        dialect = _dialect(executor)
+        for day in sorted(missing):
+            if dialect == "postgresql":
+                start, end = day_bounds(day)
+                await executor.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {partition_name(day)} "
+                        f"PARTITION OF {PARENT} FOR VALUES FROM ({start}) TO ({end})"
+                    )
+                )
+            else:
+                await executor.execute(CreateTable(self._table(day), if_not_exists=True))
+            logger.info(f"History partition {partition_name(day)} created")
+        if dialect == "sqlite":
+            await self._rebuild_view(executor)
+        # A concurrent writer that does not see the days yet creates them
+        # again with IF NOT EXISTS
+        _on_commit(executor, lambda: self._days.update(missing))
+
+    async def insert(self, session: AsyncSession, rows: List[dict]) -> Dict[Key, Value]:
+        """
+        Inserts samples into their day partitions: COPY into the partitioned
+        table on PostgreSQL, a multi-row INSERT per partition on SQLite.
+        A later sample with the same (sensor_id, ts) replaces the stored one.
+
+        :return: stored values the samples replaced, by (sensor_id, ts)
+        """
+        unique = {(row["sensor_id"], row["ts"]): row for row in rows}
+        by_day: Dict[date, List[dict]] = {}
+        for row in unique.values():
+            by_day.setdefault(day_of(row["ts"]), []).append(row)
+        replaced = await self._stored(session, by_day)
+        await self.ensure(session, by_day)
+        if _dialect(session) == "postgresql":
+            if replaced:
+                await session.execute(_upsert_samples(), list(unique.values()))
+            else:
+                await self._copy(session, list(unique.values()))
+            return replaced
+        for day, day_rows in by_day.items():
+            stmt = sqlite_insert(self._table(day))
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["sensor_id", "ts"],
+                    set_={"value": stmt.excluded.value},
+                ),
+                day_rows,
+            )
+        return replaced
+
+    def tables(
+        self,
+        executor: Executor,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> List[Table]:
+        """
+        Tables holding samples of the [start, end) window (epoch ms): the
+        partitioned table itself on PostgreSQL, the overlapping day
+        partitions on SQLite.
+        """
+        if _dialect(executor) == "postgresql":
+            return [SensorSample.__table__]
+        return [
+            self._table(day)
+            for day in self.days
+            if (start is None or day_bounds(day)[1] > start)
+            and (end is None or day_bounds(day)[0] < end)
+        ]
+
+    async def drop_before(self, executor: Executor, cutoff: int) -> List[str]:
+        """
+        Drops the partitions whose whole day is older than cutoff (epoch ms).
+
+        :return: names of the dropped partitions
+        """
+        if not self.loaded:
+            await self.load(executor)
+        expired = [day for day in self.days if day_bounds(day)[1] <= cutoff]
+        if not expired:
+            return []
+        for day in expired:
+            await executor.execute(text(f"DROP TABLE IF EXISTS {partition_name(day)}"))
+        if _dialect(executor) == "sqlite":
+            await self._rebuild_view(executor)
+
+        def forget() -> None:
+            self._days.difference_update(expired)
+            for day in expired:
+                # A late reading may create the day again
+                table = self._tables.pop(day, None)
+                if table is not None:
+                    self._metadata.remove(table)
+
+        _on_commit(executor, forget)
+        return [partition_name(day) for day in expired]
+
+    async def _copy(self, session: AsyncSession, rows: List[dict]) -> None:
+        import asyncpg
+
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        try:
+            # COPY cannot skip conflicting rows; a nested asyncpg transaction
+            # is a savepoint that keeps the batch transaction usable for the
+            # upsert fallback
+            async with driver_connection.transaction():
+                await driver_connection.copy_records_to_table(
+                    PARENT,
+                    records=[tuple(row[column] for column in COLUMNS) for row in rows],
+                    columns=COLUMNS,
+                )
+        except asyncpg.UniqueViolationError:
+            await session.execute(_upsert_samples(), rows)
+
+    async def _stored(
+        self, session: AsyncSession, by_day: Dict[date, List[dict]]
+    ) -> Dict[Key, Value]:
+        """Values already stored under the (sensor_id, ts) of the given samples."""
+        if not self.loaded:
+            await self.load(session)
+        stored: Dict[Key, Value] = {}
+        postgresql = _dialect(session) == "postgresql"
+        for day, day_rows in by_day.items():
+            # Days the router does not know have no partition yet
+            if day not in self._days:
+                continue
+            table = SensorSample.__table__ if postgresql else self._table(day)
+            keys = [(row["sensor_id"], row["ts"]) for row in day_rows]
+            for start in range(0, len(keys), STORED_CHUNK):
+                result = await session.execute(
+                    select(table.c.sensor_id, table.c.ts, table.c.value).where(
+                        tuple_(table.c.sensor_id, table.c.ts).in_(
+                            keys[start : start + STORED_CHUNK]
+                        )
+                    )
+                )
+                stored.update(((sensor_id, ts), value) for sensor_id, ts, value in result)
+        return stored
+
+    def _table(self, day: date) -> Table:
+        partition = self._tables.get(day)
+        if partition is None:
+            partition = Table(
+                partition_name(day),
+                self._metadata,
+                Column("sensor_id", Integer, primary_key=True, autoincrement=False),
+                Column("ts", BigInteger, primary_key=True),
+                Column("value", Float),
+                sqlite_with_rowid=False,
+            )
+            self._tables[day] = partition
+        return partition
+
+    async def _rebuild_view(self, executor: Executor) -> None:
+        """
+        Recreates the sensor_samples view over the day partitions the
+        database holds, including those created by the current transaction.
+        """
+        columns = ", ".join(COLUMNS)
+        names = await self._table_names(executor, PARENT)
+        selects = [
+            f"SELECT {columns} FROM {name}"
+            for name in sorted(names)
+            if _NAME_RE.match(name)
+        ]
+        await executor.execute(text(f"DROP VIEW IF EXISTS {PARENT}"))
+        result = await executor.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'view' AND name LIKE :p"),
+            {"p": f"{PARENT}_part%"},
+        )
+        for name in result.scalars().all():
+            await executor.execute(text(f"DROP VIEW {name}"))
+
+        if len(selects) > VIEW_TERMS:
+            parts = []
+            for start in range(0, len(selects), VIEW_TERMS):
+                name = f"{PARENT}_part{start // VIEW_TERMS}"
+                body = " UNION ALL ".join(selects[start : start + VIEW_TERMS])
+                await executor.execute(text(f"CREATE VIEW {name} AS {body}"))
+                parts.append(f"SELECT {columns} FROM {name}")
+            selects = parts
+        body = " UNION ALL ".join(selects) or (
+            "SELECT NULL AS sensor_id, NULL AS ts, NULL AS value WHERE 0"
+        )
+        await executor.execute(text(f"CREATE VIEW {PARENT} AS {body}"))
+
+    async def _table_names(self, executor: Executor, prefix: str) -> List[str]:
+        if _dialect(executor) == "postgresql":
+            result = await executor.execute(
+                text(
+                    "SELECT c.relname FROM pg_class c "
+                    "WHERE c.relname LIKE :p AND c.relkind IN ('r', 'p') "
+                    "AND pg_table_is_visible(c.oid)"
+                ),
+                {"p": f"{prefix}_%"},
+            )
+        else:
+            result = await executor.execute(
+                text(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :p"
+                ),
+                {"p": f"{prefix}_%"},
+            )
+        return list(result.scalars().all())
+
+    async def _upgrade_sensors(self, conn: AsyncConnection) -> None:
+        """Adds sensors.unit to databases created before it existed."""
+        columns = await conn.run_sync(
+            lambda sync_conn: {
+                column["name"]
+                for column in inspect(sync_conn).get_columns(Sensor.__tablename__)
+            }
+        )
+        if "unit" not in columns:
+            await conn.execute(
+                text(f"ALTER TABLE {Sensor.__tablename__} ADD COLUMN unit VARCHAR")
+            )
+
+    async def _legacy_kind(self, conn: AsyncConnection) -> Optional[str]:
+        if _dialect(conn) == "postgresql":
+            query = (
+                "SELECT c.relkind FROM pg_class c "
+                "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+            )
+        else:
+            query = "SELECT type FROM sqlite_master WHERE name = :name"
+        return (await conn.execute(text(query), {"name": LEGACY})).scalar()
+
+    async def _migrate_legacy(self, conn: AsyncConnection, kind: str) -> None:
+        """
+        Moves the sensors_data history into sensor_samples day by day:
+        device_id becomes sensors.id, timestamp becomes epoch ms, the unit of
+        the latest row goes to sensors.unit and payloads that are not just
+        {"value", "unit"} go to sensor_samples_raw. Then drops sensors_data.
+
+        sensors_data holds naive local times. SQLite converts them with the
+        timezone of the process, PostgreSQL with the TimeZone of the session.
+        """
+        postgresql = _dialect(conn) == "postgresql"
+        if postgresql:
+            days_query = (
+                f"SELECT DISTINCT (timestamp::timestamptz AT TIME ZONE 'UTC')::date "
+                f"FROM {LEGACY}"
+            )
+            ts = "floor(extract(epoch FROM d.timestamp::timestamptz) * 1000)::bigint"
+            bound = (
+                "to_timestamp(CAST(:{} AS bigint)) "
+                "AT TIME ZONE current_setting('TimeZone')"
+            )
+            custom = (
+                "d.data::jsonb IS DISTINCT FROM "
+                "jsonb_build_object('value', d.value, 'unit', d.unit)"
+            )
+        else:
+            days_query = f"SELECT DISTINCT date(timestamp, 'utc') FROM {LEGACY}"
+            ts = (
+                "CAST(strftime('%s', d.timestamp, 'utc') AS INTEGER) * 1000 "
+                "+ CAST(substr(strftime('%f', d.timestamp), 4) AS INTEGER)"
+            )
+            bound = "datetime(:{}, 'unixepoch', 'localtime')"
+            custom = (
+                "NOT (json_valid(d.data) AND json_type(d.data, '$.value') "
+                "IN ('integer', 'real') AND json_extract(d.data, '$.value') = d.value "
+                "AND json_extract(d.data, '$.unit') IS d.unit "
+                "AND (SELECT count(*) FROM json_each(d.data)) = 2)"
+            )
+        days = sorted(
+            value if isinstance(value, date) else date.fromisoformat(value)
+            for (value,) in (await conn.execute(text(days_query))).all()
+        )
+        await self.ensure(conn, days)
+        joined = (
+            f"FROM {LEGACY} d JOIN {Sensor.__tablename__} s ON s.device_id = d.device_id "
+            f"WHERE d.timestamp >= {bound.format('start')} "
+            f"AND d.timestamp < {bound.format('end')}"
+        )
+        for day in days:
+            target = PARENT if postgresql else partition_name(day)
+            # Bounds of the UTC day as local times, in epoch seconds
+            start, end = day_bounds(day)
+            bounds = {"start": start // 1000, "end": end // 1000}
+            await conn.execute(
+                text(
+                    f"INSERT INTO {target} (sensor_id, ts, value) "
+                    f"SELECT s.id, {ts}, d.value {joined} ON CONFLICT DO NOTHING"
+                ),
+                bounds,
+            )
+            if settings.database.store_raw:
+                await conn.execute(
+                    text(
+                        f"INSERT INTO {SensorSampleRaw.__tablename__} "
+                        f"(sensor_id, ts, data) SELECT s.id, {ts}, d.data {joined} "
+                        f"AND {custom} ON CONFLICT DO NOTHING"
+                    ),
+                    bounds,
+                )
+        await conn.execute(
+            text(
+                f"UPDATE {Sensor.__tablename__} SET unit = ("
+                f"SELECT d.unit FROM {LEGACY} d "
+                f"WHERE d.device_id = {Sensor.__tablename__}.device_id "
+                "ORDER BY d.timestamp DESC LIMIT 1) WHERE unit IS NULL"
+            )
+        )
+
+        if postgresql:
+            # Partitions of a partitioned sensors_data are dropped with it
+            await conn.execute(text(f"DROP TABLE {LEGACY}"))
+        else:
+            kind = "VIEW" if kind == "view" else "TABLE"
+            await conn.execute(text(f"DROP {kind} {LEGACY}"))
+            for name in await self._table_names(conn, LEGACY):
+                if _LEGACY_NAME_RE.match(name):
+                    await conn.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"History migrated from {LEGACY} to {len(days)} day partitions")
+
+
+partition_router = PartitionRouter()
@@ -0,0 +1,281 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    ColumnCollection,
+    ColumnElement,
+    and_,
+    case,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from db.partitions import partition_router
+from models import SensorRollup, SensorSample
+
+logger = logging.getLogger(__name__)
+
+# Bucket widths in seconds, finest first
+RESOLUTIONS: Tuple[int, ...] = (60, 3600, 86400)
+# Rollup whose counts estimate how many raw samples a range holds
+ESTIMATE_RESOLUTION = 3600
+# Minimum number of buckets a windowed aggregate is read from
+WINDOW_BUCKETS = 24
+
+
+def bucket_of(ts: int, resolution: int) -> int:
+    """Start (epoch ms) of the bucket of the given width that holds ts."""
+    return ts - ts % (resolution * 1000)
+
+
+def ended_before(columns: ColumnCollection, cutoff: int) -> ColumnElement[bool]:
+    """
+    Rollups whose whole bucket ends by cutoff (epoch ms). The bucket that
+    holds cutoff still aggregates samples newer than it and is kept.
+    """
+    return or_(
+        *(
+            and_(
+                columns.resolution == resolution, columns.ts <= cutoff - resolution * 1000
+            )
+            for resolution in RESOLUTIONS
+        )
+    )
+
+
+def aggregate(samples: Iterable[dict]) -> List[dict]:
+    """
+    Folds samples into one row per (sensor, resolution, bucket) for every
+    resolution. Samples without a value are not aggregated.
+    """
+    rollups: Dict[Tuple[int, int, int], dict] = {}
+    for sample in samples:
+        if sample["value"] is None:
+            continue
+        value, ts = float(sample["value"]), sample["ts"]
+        for resolution in RESOLUTIONS:
+            key = (sample["sensor_id"], resolution, bucket_of(ts, resolution))
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollups[key] = {
+                    "sensor_id": key[0],
+                    "resolution": resolution,
+                    "ts": key[2],
+                    "count": 1,
+                    "total": value,
+                    "min": value,
+                    "max": value,
+                    "last_ts": ts,
+                    "last_value": value,
+                }
+                continue
+            rollup["count"] += 1
+            rollup["total"] += value
+            rollup["min"] = min(rollup["min"], value)
+            rollup["max"] = max(rollup["max"], value)
+            if ts >= rollup["last_ts"]:
+                rollup["last_ts"], rollup["last_value"] = ts, value
+    return list(rollups.values())
+
+
+def pick_resolution(span: int, samples: int, max_points: int) -> Optional[int]:
+    """
+    Resolution for a history request: raw samples (None) while they fit
+    into max_points, otherwise the finest rollup whose buckets over the
+    span do, and the coarsest rollup if none does.
+
+    :param span: requested range in ms
+    :param samples: (estimated) number of raw samples in the range
+    :param max_points: point budget of the request
+    """
+    if samples <= max_points:
+        return None
+    for resolution in RESOLUTIONS:
+        if span / (resolution * 1000) <= max_points:
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+def window_resolution(window: int) -> int:
+    """
+    Resolution for an aggregate over the last `window` seconds: the coarsest
+    rollup that still splits the window into at least WINDOW_BUCKETS
+    buckets, so the partially covered oldest bucket skews it little.
+    """
+    for resolution in reversed(RESOLUTIONS):
+        if window >= resolution * WINDOW_BUCKETS:
+            return resolution
+    return RESOLUTIONS[0]
+
+
+async def upsert(
+    session: AsyncSession,
+    samples: List[dict],
+    replaced: Optional[Dict[Tuple[int, int], Optional[float]]] = None,
+) -> int:
+    """
+    Adds a batch of samples, unique by (sensor_id, ts) and already written
+    to sensor_samples, to the rollups with one multi-row
+    INSERT ... ON CONFLICT DO UPDATE that merges into the stored buckets.
+    The buckets of samples that replaced a stored value are rebuilt from
+    sensor_samples instead, a merge would count the old value as well.
+
+    :param replaced: stored values the samples replaced, by (sensor_id, ts)
+    :return: number of rollup rows written
+    """
+    replaced = replaced or {}
+    fresh, changed = [], []
+    for sample in samples:
+        key = (sample["sensor_id"], sample["ts"])
+        if key not in replaced:
+            fresh.append(sample)
+        elif replaced[key] != sample["value"]:
+            changed.append(sample)
+    rows = aggregate(fresh)
+    if rows:
+        await session.execute(_merge(session.bind.dialect.name), rows)
+    if changed:
+        return len(rows) + await _rebuild(session, changed)
+    return len(rows)
+
+
+async def backfill(conn: AsyncConnection) -> None:
+    """
+    Builds the rollups from the stored samples when the rollup table is
+    empty (databases created before rollups or migrated on startup).
+    """
+    if await conn.scalar(select(SensorRollup.sensor_id).limit(1)) is not None:
+        return
+    if await conn.scalar(select(SensorSample.sensor_id).limit(1)) is None:
+        return
+    for resolution in RESOLUTIONS:
+        bucket = SensorSample.ts - SensorSample.ts % (resolution * 1000)
+        await conn.execute(
+            insert(SensorRollup).from_select(
+                [
+                    "sensor_id",
+                    "resolution",
+                    "ts",
+                    "count",
+                    "total",
+                    "min",
+                    "max",
+                    "last_ts",
+                ],
+                select(
+                    SensorSample.sensor_id,
+                    literal(resolution),
+                    bucket,
+                    func.count(SensorSample.value),
+                    func.sum(SensorSample.value),
+                    func.min(SensorSample.value),
+                    func.max(SensorSample.value),
+                    func.max(SensorSample.ts),
+                )
+                .where(SensorSample.value.is_not(None))
+                .group_by(SensorSample.sensor_id, bucket),
+            )
+        )
+    await conn.execute(
+        update(SensorRollup)
+        .values(
+            last_value=select(SensorSample.value)
+            .where(
+                SensorSample.sensor_id == SensorRollup.sensor_id,
+                SensorSample.ts == SensorRollup.last_ts,
+            )
+            .scalar_subquery()
+        )
+        .where(SensorRollup.last_value.is_(None))
+    )
+    logger.info("Rollups built from the stored history")
+
+
+async def _rebuild(session: AsyncSession, samples: List[dict]) -> int:
+    """
+    Recomputes the buckets holding the given samples from sensor_samples:
+    every affected (sensor, day) is read once and folded again.
+    """
+    day = RESOLUTIONS[-1]
+    affected = {
+        (sample["sensor_id"], resolution, bucket_of(sample["ts"], resolution))
+        for sample in samples
+        for resolution in RESOLUTIONS
+    }
+    stored: List[dict] = []
+    for sensor_id, resolution, start in affected:
+        if resolution != day:
+            continue
+        end = start + day * 1000
+        for table in partition_router.tables(session, start, end):
+            result = await session.execute(
+                select(table.c.ts, table.c.value).where(
+                    table.c.sensor_id == sensor_id, table.c.ts >= start, table.c.ts < end
+                )
+            )
+            stored.extend(
+                {"sensor_id": sensor_id, "ts": ts, "value": value} for ts, value in result
+            )
+
+    rows = [
+        row
+        for row in aggregate(stored)
+        if (row["sensor_id"], row["resolution"], row["ts"]) in affected
+    ]
+    if rows:
+        await session.execute(_replace(session.bind.dialect.name), rows)
+    # Buckets left without values
+    empty = affected - {(row["sensor_id"], row["resolution"], row["ts"]) for row in rows}
+    for sensor_id, resolution, ts in empty:
+        await session.execute(
+            delete(SensorRollup).where(
+                SensorRollup.sensor_id == sensor_id,
+                SensorRollup.resolution == resolution,
+                SensorRollup.ts == ts,
+            )
+        )
+    logger.debug(f"Rollups rebuilt: {len(rows)} buckets, {len(empty)} emptied")
+    return len(rows)
+
+
+def _replace(dialect: str):
+    stmt = (postgresql_insert if dialect == "postgresql" else sqlite_insert)(SensorRollup)
+    return stmt.on_conflict_do_update(
+        index_elements=[SensorRollup.sensor_id, SensorRollup.resolution, SensorRollup.ts],
+        set_={
+            column: stmt.excluded[column]
+            for column in ("count", "total", "min", "max", "last_ts", "last_value")
+        },
+    )
+
+
+def _merge(dialect: str):
+    if dialect == "postgresql":
+        stmt = postgresql_insert(SensorRollup)
+        least, greatest = func.least, func.greatest
+    else:
+        # SQLite min()/max() with several arguments are scalar functions
+        stmt = sqlite_insert(SensorRollup)
+        least, greatest = func.min, func.max
+    newer = stmt.excluded.last_ts >= SensorRollup.last_ts
+    return stmt.on_conflict_do_update(
+        index_elements=[SensorRollup.sensor_id, SensorRollup.resolution, SensorRollup.ts],
+        set_={
+            "count": SensorRollup.count + stmt.excluded.count,
+            "total": SensorRollup.total + stmt.excluded.total,
+            "min": least(SensorRollup.min, stmt.excluded.min),
+            "max": greatest(SensorRollup.max, stmt.excluded.max),
+            "last_ts": greatest(SensorRollup.last_ts, stmt.excluded.last_ts),
+            "last_value": case(
+                (newer, stmt.excluded.last_value), else_=SensorRollup.last_value
+            ),
+        },
+    )
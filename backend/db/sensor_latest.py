@@ -0,0 +1,87 @@
+import logging
+from typing import Dict, List
+
+from sqlalchemy import and_, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from models import SensorLatest, SensorSample, SensorSampleRaw
+
+logger = logging.getLogger(__name__)
+
+
+async def upsert(session: AsyncSession, rows: List[dict]) -> int:
+    """
+    Stores the newest of the given samples of every sensor with one
+    multi-row INSERT ... ON CONFLICT DO UPDATE. A stored row is replaced only
+    by a sample that is not older than it.
+
+    :param rows: dicts with sensor_id, ts, value and data (None when the
+        payload is rebuilt from value and unit)
+    :return: number of sensors written
+    """
+    latest: Dict[int, dict] = {}
+    for row in rows:
+        stored = latest.get(row["sensor_id"])
+        if stored is None or row["ts"] >= stored["ts"]:
+            latest[row["sensor_id"]] = row
+    if not latest:
+        return 0
+    if session.bind.dialect.name == "postgresql":
+        stmt = postgresql_insert(SensorLatest)
+    else:
+        stmt = sqlite_insert(SensorLatest)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[SensorLatest.sensor_id],
+            set_={
+                "ts": stmt.excluded.ts,
+                "value": stmt.excluded.value,
+                "data": stmt.excluded.data,
+            },
+            where=stmt.excluded.ts >= SensorLatest.ts,
+        ),
+        list(latest.values()),
+    )
+    return len(latest)
+
+
+async def backfill(conn: AsyncConnection) -> None:
+    """
+    Fills sensor_latest from the stored samples when it is empty
+    (databases created before it).
+    """
+    if await conn.scalar(select(SensorLatest.sensor_id).limit(1)) is not None:
+        return
+    newest = (
+        select(SensorSample.sensor_id, func.max(SensorSample.ts).label("ts"))
+        .group_by(SensorSample.sensor_id)
+        .subquery()
+    )
+    await conn.execute(
+        insert(SensorLatest).from_select(
+            ["sensor_id", "ts", "value", "data"],
+            select(
+                SensorSample.sensor_id,
+                SensorSample.ts,
+                SensorSample.value,
+                SensorSampleRaw.data,
+            )
+            .join(
+                newest,
+                and_(
+                    SensorSample.sensor_id == newest.c.sensor_id,
+                    SensorSample.ts == newest.c.ts,
+                ),
+            )
+            .outerjoin(
+                SensorSampleRaw,
+                and_(
+                    SensorSampleRaw.sensor_id == SensorSample.sensor_id,
+                    SensorSampleRaw.ts == SensorSample.ts,
+                ),
+            ),
+        )
+    )
+    logger.debug("sensor_latest filled from the stored history")
@@ -6,6 +6,7 @@ from typing import List, Optional
 import redis.asyncio as redis
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.openapi.utils import get_openapi
 
 from api.api_v1 import router
@@ -19,7 +20,9 @@ from services.actuator_manager import ActuatorManager
 from services.automations import load_all_automations
 from services.mqtt_client import AsyncMQTTClient
 from services.mqtt_helper import create_mqtt_client
+from services.plugin_state import plugin_state
 from services.plugins import load_plugins
+from services.retention import RetentionService
 from utils.automations import AutomationEngine
 from utils.dependencies import setup_plugin_dependencies, set_automation_engine
 
@@ -44,6 +47,7 @@ async def lifespan(app: FastAPI):
 
         async with async_session_context() as db_session:
             await SensorDataCRUD.drop_state(db_session)
+            await plugin_state.load(db_session)
             loaded_plugins = await load_plugins(db_session)
             plugins.clear()
             plugins.update(loaded_plugins)
@@ -78,8 +82,9 @@ async def lifespan(app: FastAPI):
                 if settings.collector.mqtt
                 else None
             ),
+            asyncio.create_task(RetentionService().run()),
         ]
-        logger.info("DataCollector and MQTTCollector tasks created")
+        logger.info("DataCollector, MQTTCollector and retention tasks created")
 
         automations = load_all_automations("./automations")
         automation_engine = AutomationEngine(
@@ -159,7 +164,12 @@ app.add_middleware(
         "Sec-WebSocket-Version",
         "Sec-WebSocket-Protocol",
     ],
-    expose_headers=[],
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=settings.app_settings.gzip_min_size,
+    compresslevel=settings.app_settings.gzip_level,
 )
 
 
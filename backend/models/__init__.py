@@ -1,11 +1,20 @@
 from .actuators import Actuator, ActuatorCommand
 from .layouts import Layout
 from .plugins import PluginRegistry
-from .sensor import SensorData, Sensor
+from .sensor import (
+    Sensor,
+    SensorLatest,
+    SensorRollup,
+    SensorSample,
+    SensorSampleRaw,
+)
 from .settings import SystemSetting
 
 __all__ = [
-    "SensorData",
+    "SensorSample",
+    "SensorSampleRaw",
+    "SensorRollup",
+    "SensorLatest",
     "SystemSetting",
     "Sensor",
     "PluginRegistry",
@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, Optional
 
-from sqlalchemy import Text, Index
+from sqlalchemy import BigInteger, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from db.database import Base
@@ -16,6 +16,7 @@ class Sensor(Base):
     device_id: Mapped[str] = mapped_column(unique=True, nullable=False)  # Технический ID
     name: Mapped[str] = mapped_column(nullable=False)  # Пользовательское имя
     description: Mapped[Optional[str]] = mapped_column(Text)  # Доп. описание
+    unit: Mapped[Optional[str]]  # Единица измерения последнего замера
     online: Mapped[bool] = mapped_column(default=False, nullable=False)
     created_at: Mapped[datetime] = mapped_column(default=datetime.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
@@ -23,21 +24,79 @@ class Sensor(Base):
     )
 
 
-class SensorData(Base):
-    """История данных с устройств."""
+class SensorSample(Base):
+    """
+    История показаний: одна узкая строка на замер.
+    Датчик задаётся суррогатным ключом sensors.id, время — миллисекундами
+    Unix-времени, UTC (utils.helpers.to_epoch_ms), единицы измерения хранятся
+    один раз в sensors.unit.
+    Секционирована по дням (db/partitions.py): в PostgreSQL это таблица
+    PARTITION BY RANGE (ts), в SQLite — представление над дневными таблицами
+    WITHOUT ROWID, где первичный ключ (sensor_id, ts) и есть кластерный индекс.
+    """
 
-    __tablename__ = "sensors_data"
+    __tablename__ = "sensor_samples"
     __table_args__ = (
-        Index(
-            "idx_sensor_device_timestamp",
-            "device_id",
-            "timestamp",
-            postgresql_using="btree",
-        ),
+        {
+            "postgresql_partition_by": "RANGE (ts)",
+            "info": {"partitioned": True},
+        },
     )
-    id: Mapped[int] = mapped_column(primary_key=True)
-    device_id: Mapped[str] = mapped_column(nullable=False)
-    timestamp: Mapped[datetime] = mapped_column(default=datetime.now(), nullable=False)
+    # Ключ секционирования должен входить в первичный ключ
+    sensor_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    ts: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    value: Mapped[Optional[float]]
+
+    @staticmethod
+    def payload(value: Optional[float], unit: Optional[str]) -> Dict[str, Any]:
+        """Payload замера без записи в sensor_samples_raw."""
+        return {"value": value, "unit": unit}
+
+
+class SensorSampleRaw(Base):
+    """
+    Исходный JSON замера. Пишется только если settings.database.store_raw
+    включён и payload нельзя восстановить как {"value": ..., "unit": ...}.
+    """
+
+    __tablename__ = "sensor_samples_raw"
+
+    sensor_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    ts: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     data: Mapped[str] = mapped_column(Text, nullable=False)  # JSON-строка
+
+
+class SensorLatest(Base):
+    """
+    Последний замер каждого датчика (db/sensor_latest.py). Обновляется
+    пакетным писателем в той же транзакции, что и sensor_samples, и не
+    очищается при удалении истории. data — как в sensor_samples_raw.
+    """
+
+    __tablename__ = "sensor_latest"
+
+    sensor_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    ts: Mapped[int] = mapped_column(BigInteger, nullable=False)
     value: Mapped[Optional[float]]
-    unit: Mapped[Optional[str]]
+    data: Mapped[Optional[str]] = mapped_column(Text)
+
+
+class SensorRollup(Base):
+    """
+    Агрегаты замеров по интервалам (db/rollups.py): resolution — ширина
+    интервала в секундах (60, 3600, 86400), ts — начало интервала в мс.
+    Обновляются пакетным писателем вместе с sensor_samples.
+    """
+
+    __tablename__ = "sensor_rollups"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    sensor_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    resolution: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    ts: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    count: Mapped[int] = mapped_column(nullable=False)
+    total: Mapped[float] = mapped_column(nullable=False)  # Сумма для среднего
+    min: Mapped[float] = mapped_column(nullable=False)
+    max: Mapped[float] = mapped_column(nullable=False)
+    last_ts: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    last_value: Mapped[Optional[float]]
@@ -4,9 +4,9 @@ from abc import ABC, abstractmethod
 from datetime import datetime
 from typing import Dict, Any, AsyncGenerator
 
-from crud.plugins import Plugins
 from mock.gpio_adapter import GPIO, is_rpi
 from schemas.sensors import SensorMessage
+from services.plugin_state import plugin_state
 
 logger = logging.getLogger(__name__)
 
@@ -53,13 +53,13 @@ class DevicePlugin(ABC):
         """
         await self.init_hardware()
         logger.info(f"The {self.device_id} plugin is running")
-        while await Plugins.is_running(self.device_id):
+        while plugin_state.is_running(self.device_id):
             try:
                 data = await self.read_data()
                 if data:
                     result = SensorMessage(
                         device_id=self.device_id,
-                        timestamp=datetime.now().isoformat(),
+                        timestamp=datetime.now().astimezone().isoformat(),
                         data=data,
                         unit=data["unit"],
                         online=data.get("online"),
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from pydantic import BaseModel
 
@@ -13,6 +13,11 @@ class SensorMessage(BaseModel):
     online: Optional[bool] = None
 
 
+class SensorOnlineMessage(BaseModel):
+    device_id: str
+    online: bool
+
+
 class SensorBaseSchema(BaseModel):
     device_id: str
     name: str
@@ -52,3 +57,32 @@ class SensorDataReadSchema(BaseModel):
     timestamp: datetime
     value: Optional[float] = None
     unit: Optional[str] = None
+
+
+class SensorBucketReadSchema(SensorDataReadSchema):
+    """Точка истории из агрегата: value — среднее по интервалу."""
+
+    min: float
+    max: float
+    count: int
+
+
+# Сырые замеры без min/max/count, агрегаты — с ними
+SensorHistoryPoint = Union[SensorBucketReadSchema, SensorDataReadSchema]
+
+
+class SensorHistoryPage(BaseModel):
+    items: List[SensorHistoryPoint]
+    next_cursor: Optional[str] = None  # None — последняя страница
+    resolution: Optional[int] = None  # как в SensorSeries
+
+
+class SensorSeries(BaseModel):
+    """История датчика в колонках: timestamps[i] соответствует values[i]."""
+
+    device_id: str
+    unit: Optional[str] = None
+    # None — сырые замеры, иначе ширина агрегата в секундах (values — средние)
+    resolution: Optional[int] = None
+    timestamps: List[int]  # мс Unix-времени (UTC), по возрастанию
+    values: List[Optional[float]]
@@ -12,6 +12,7 @@ from mock.gpio_adapter import is_rpi, GPIO
 from plugins.template import ActuatorPlugin
 from schemas.actuators import ActuatorCreate, ActuatorUpdate
 from schemas.plugins import PluginBaseSchema
+from services.plugin_state import plugin_state
 
 logger = logging.getLogger(__name__)
 
@@ -64,7 +65,7 @@ class ActuatorManager:
                         )
                         if registry:
                             device_id = registry.device_id
-                            if not await Plugins.is_running(device_id):
+                            if not plugin_state.is_running(device_id):
                                 continue
                         else:
                             uid = uuid.uuid4().hex[:12]
@@ -3,9 +3,7 @@ import logging
 from typing import Optional
 
 import redis.asyncio as redis
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.database import engine
 from services.mqtt_client import AsyncMQTTClient
 
 logger = logging.getLogger(__name__)
@@ -21,18 +19,18 @@ class BaseCollector:
         self,
         mqtt_client: Optional[AsyncMQTTClient] = None,
         redis_client: Optional[redis.Redis] = None,
-        db_session: Optional[AsyncSession] = None,
     ):
         """
         Initialization of the basic collector.
 
         :param mqtt_client: instance of AsyncMQTTClient (may be None)
         :param redis_client: a redis instance.Redis (maybe None)
-        :param db_session: DB session AsyncSession (may be None)
+
+        Collectors do not keep a DB session: every unit of work opens its own
+        one from db.database.session_factory, so concurrent tasks never share it.
         """
         self.mqtt_client = mqtt_client
         self.redis_client = redis_client
-        self.db_session = db_session or AsyncSession(bind=engine)
         self._is_running = False
 
     async def collect(self):
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Union
+
+from schemas.sensors import SensorMessage, SensorOnlineMessage
+
+logger = logging.getLogger(__name__)
+
+QueueMessage = Union[SensorMessage, SensorOnlineMessage]
+BatchHandler = Callable[[List[QueueMessage]], Awaitable[object]]
+
+
+class BatchQueue:
+    """
+    Bounded queue of sensor messages (readings and online transitions)
+    drained by a single batch writer.
+    Producers put messages, run() collects them into batches by size/time
+    thresholds and passes every batch to the handler.
+    """
+
+    def __init__(
+        self,
+        handler: BatchHandler,
+        maxsize: int = 1000,
+        batch_size: int = 5,
+        flush_interval: float = 2.0,
+    ):
+        """
+        :param handler: coroutine function that receives a batch of messages
+        :param maxsize: maximum number of messages waiting in the queue
+        :param batch_size: number of messages that triggers a flush
+        :param flush_interval: maximum age of a batch (in seconds) before it is flushed
+        """
+        self.handler = handler
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.flushed = 0
+        self._queue: asyncio.Queue[QueueMessage] = asyncio.Queue(maxsize=maxsize)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def put(self, message: QueueMessage) -> None:
+        """Puts a message, waiting for free space when the queue is full."""
+        await self._queue.put(message)
+
+    def put_nowait(self, message: QueueMessage) -> bool:
+        """
+        Puts a message without waiting.
+
+        :return: False if the queue is full and the message was dropped
+        """
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(
+                f"Queue is full ({self._queue.maxsize}), message from "
+                f"{message.device_id} dropped (total dropped: {self.dropped})"
+            )
+            return False
+
+    async def run(self) -> None:
+        """
+        Endless drain loop. Stops only when the task is cancelled; messages
+        already taken off the queue by then are flushed before it stops.
+        """
+        batch: List[QueueMessage] = []
+        try:
+            while True:
+                batch = []
+                await self._next_batch(batch)
+                await self._flush(batch)
+        except asyncio.CancelledError:
+            # An interrupted flush is repeated: samples are upserted, so a
+            # batch saved twice is not duplicated, while a dropped one is lost
+            if batch:
+                await self._flush(batch)
+            raise
+
+    async def drain(self) -> None:
+        """Flushes everything that is left in the queue (used on shutdown)."""
+        batch: List[QueueMessage] = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            await self._flush(batch)
+
+    async def _next_batch(self, batch: List[QueueMessage]) -> None:
+        """Collects the next batch into `batch`, which keeps it on cancellation."""
+        batch.append(await self._queue.get())
+        # Unlike wait_for, timeout() awaits get() in this task, so a message
+        # it returns is never lost to a cancellation
+        try:
+            async with asyncio.timeout(self.flush_interval):
+                while len(batch) < self.batch_size:
+                    batch.append(await self._queue.get())
+        except TimeoutError:
+            pass
+
+    async def _flush(self, batch: List[QueueMessage]) -> None:
+        try:
+            await self.handler(batch)
+            self.flushed += len(batch)
+        except Exception as e:
+            logger.error(
+                f"Error when flushing batch of {len(batch)} messages: {e}", exc_info=True
+            )
@@ -1,91 +1,159 @@
-import json
 import logging
+import time
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.settings import settings
-from crud.sensors import SensorDataCRUD
-from models import Sensor, SensorData
-from schemas.sensors import SensorMessage, SensoeUpdateSchema
+from db import rollups, sensor_latest
+from db.partitions import partition_router
+from models import Sensor, SensorLatest, SensorSample, SensorSampleRaw
+from schemas.sensors import SensorMessage
+from services.response_cache import response_cache
+from utils import codec
+from utils.helpers import to_epoch_ms
 
 logger = logging.getLogger(__name__)
 
 
+class LastValueCache:
+    """
+    Latest stored payload per device_id, used to skip unchanged readings.
+    Seeded once from the database and kept current by the batch writer.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, dict] = {}
+        self.seeded = False
+
+    async def seed(self, db_session: AsyncSession) -> None:
+        result = await db_session.execute(
+            select(
+                Sensor.device_id, Sensor.unit, SensorLatest.value, SensorLatest.data
+            ).join(SensorLatest, SensorLatest.sensor_id == Sensor.id)
+        )
+        for device_id, unit, value, data in result.all():
+            if data is None:
+                self._data[device_id] = SensorSample.payload(value, unit)
+                continue
+            try:
+                self._data[device_id] = codec.loads(data)
+            except (ValueError, TypeError) as e:
+                logger.error(f"Invalid stored data for {device_id}: {e}")
+        self.seeded = True
+        logger.debug(f"Last value cache seeded: {len(self._data)} devices")
+
+    def get(self, device_id: str) -> Optional[dict]:
+        return self._data.get(device_id)
+
+    def update(self, values: Dict[str, dict]) -> None:
+        self._data.update(values)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.seeded = False
+
+
+last_value_cache = LastValueCache()
+
+
 async def save_batch_to_db(
     db_session: AsyncSession,
     messages: List[SensorMessage],
-    retention_days: int = settings.app_settings.keep_data,
 ) -> int:
     """
-    Batch-saving messages to the database with checking for changes and clearing old records.
+    Batch-saving messages to the database with checking for changes.
+    Makes one round trip per table: a multi-row UPSERT of the sensors
+    (online/unit/updated_at) that returns their ids, a bulk insert into the
+    day partitions of sensor_samples (COPY on PostgreSQL), a merge of the batch
+    into the minute/hour/day rollups, an upsert of the newest sample of every
+    sensor into sensor_latest and, for payloads that are more than a value
+    and a unit, an insert into sensor_samples_raw.
+    Old records are removed by the retention job, not here.
 
-    :param retention_days: time period to keep old records
     :param db_session: database session for operations
     :param messages: list of messages to save
-    :param retention days: number of days of data storage (for cleaning)
     :return: number of successfully saved records
     """
     if not messages:
         return 0
 
+    started = time.perf_counter()
     try:
-        device_ids = {msg.device_id for msg in messages}
-        result = await db_session.execute(
-            select(Sensor).where(Sensor.device_id.in_(device_ids))
-        )
-        devices = {dev.device_id: dev for dev in result.scalars().all()}
-        last_data_result = await db_session.execute(
-            select(SensorData)
-            .where(SensorData.device_id.in_(device_ids))
-            .order_by(SensorData.timestamp.desc())
-        )
-        last_data_list = last_data_result.scalars().all()
-        last_data_map = {item.device_id: item for item in last_data_list}
+        if not last_value_cache.seeded:
+            await last_value_cache.seed(db_session)
 
-        to_insert: List[SensorData] = []
-        to_cleanup: set = set()
+        now = datetime.now()
+        sensors: Dict[str, dict] = {}
+        changed: List[SensorMessage] = []
+        latest: Dict[str, dict] = {}
 
         for msg in messages:
-            if msg.device_id not in devices:
-                device = Sensor(device_id=msg.device_id, name=msg.device_id)
-                db_session.add(device)
-                devices[msg.device_id] = device
-            else:
-                updated_online = SensoeUpdateSchema(
-                    device_id=msg.device_id,
-                    online=msg.online,
-                    updated_at=datetime.now(),
-                )
-                await SensorDataCRUD._update_core(data=updated_online, session=db_session)
-            last_data = last_data_map.get(msg.device_id)
+            sensors[msg.device_id] = {
+                "device_id": msg.device_id,
+                "name": msg.device_id,
+                "unit": msg.unit,
+                "online": msg.online if msg.online is not None else True,
+                "created_at": now,
+                "updated_at": now,
+            }
+            last_data = latest.get(msg.device_id) or last_value_cache.get(msg.device_id)
             if _is_data_changed(last_data, msg.data):
-                to_cleanup.add(msg.device_id)
-                db_data = SensorData(
-                    device_id=msg.device_id,
-                    timestamp=datetime.fromisoformat(msg.timestamp),
-                    data=json.dumps(msg.data),
-                    value=msg.value,
-                    unit=msg.unit,
-                )
-                to_insert.append(db_data)
-        if to_cleanup:
-            for dev_id in to_cleanup:
-                await SensorDataCRUD.cleanup_old_data(
-                    session=db_session,
-                    device_id=dev_id,
-                    retention_days=retention_days,
-                )
-        if to_insert:
-            db_session.add_all(to_insert)
-            await db_session.commit()
-            logger.debug(f"Batch saved in DB: {len(to_insert)} records")
-            return len(to_insert)
+                latest[msg.device_id] = msg.data
+                changed.append(msg)
 
+        result = await db_session.execute(
+            _upsert_sensors(db_session, list(sensors.values())).returning(
+                Sensor.device_id, Sensor.id
+            )
+        )
+        sensor_ids = dict(result.all())
+
+        # Keyed by (sensor_id, ts): a later reading of the same millisecond
+        # replaces the earlier one
+        samples: Dict[Tuple[int, int], dict] = {}
+        raw: Dict[Tuple[int, int], dict] = {}
+        current: List[dict] = []
+        for msg in changed:
+            sample = {
+                "sensor_id": sensor_ids[msg.device_id],
+                "ts": to_epoch_ms(datetime.fromisoformat(msg.timestamp)),
+                "value": msg.value,
+            }
+            key = (sample["sensor_id"], sample["ts"])
+            samples[key] = sample
+            data = None
+            if settings.database.store_raw and msg.data != SensorSample.payload(
+                msg.value, msg.unit
+            ):
+                data = codec.dumps_str(msg.data)
+                raw[key] = {"sensor_id": key[0], "ts": key[1], "data": data}
+            else:
+                raw.pop(key, None)
+            current.append({**sample, "data": data})
+
+        if samples:
+            rows = list(samples.values())
+            replaced = await partition_router.insert(db_session, rows)
+            await rollups.upsert(db_session, rows, replaced)
+            await sensor_latest.upsert(db_session, current)
+        if raw:
+            await db_session.execute(_upsert_raw(db_session), list(raw.values()))
         await db_session.commit()
-        return 0
+        last_value_cache.update(latest)
+        response_cache.bump("sensors")
+
+        elapsed = time.perf_counter() - started
+        logger.debug(
+            f"Batch saved in DB: {len(samples)} samples ({len(raw)} raw), "
+            f"{len(sensors)} sensors in {elapsed * 1000:.1f} ms "
+            f"({len(messages) / elapsed:.0f} rows/s)"
+        )
+        return len(samples)
 
     except Exception as e:
         logger.error(f"Error when saving batch to DATABASE: {e}", exc_info=True)
@@ -93,27 +161,46 @@ async def save_batch_to_db(
         return 0
 
 
-def _is_data_changed(
-    last_data: Optional[SensorData], new_data: dict, cached_data: dict = None
-) -> bool:
+def _upsert_sensors(db_session: AsyncSession, rows: List[dict]):
     """
-    Checks whether the data has changed compared to the last record.
+    Multi-row INSERT ... ON CONFLICT (device_id) DO UPDATE for the sensors table.
+    New sensors are created, existing ones get only online/unit/updated_at.
+    """
+    if db_session.bind.dialect.name == "postgresql":
+        stmt = postgresql_insert(Sensor).values(rows)
+    else:
+        stmt = sqlite_insert(Sensor).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[Sensor.device_id],
+        set_={
+            "online": stmt.excluded.online,
+            "unit": stmt.excluded.unit,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+
+
+def _upsert_raw(db_session: AsyncSession):
+    """INSERT ... ON CONFLICT (sensor_id, ts) DO UPDATE for sensor_samples_raw."""
+    if db_session.bind.dialect.name == "postgresql":
+        stmt = postgresql_insert(SensorSampleRaw)
+    else:
+        stmt = sqlite_insert(SensorSampleRaw)
+    return stmt.on_conflict_do_update(
+        index_elements=[SensorSampleRaw.sensor_id, SensorSampleRaw.ts],
+        set_={"data": stmt.excluded.data},
+    )
+
+
+def _is_data_changed(last_data: Optional[dict], new_data: dict) -> bool:
+    """
+    Checks whether the data has changed compared to the last stored payload.
 
-    :param last_data: last record from the database (may be None)
+    :param last_data: last stored payload from the cache (may be None)
     :param new_data: new data for comparison
-    :param cached_data: cached data from the previous state (for optimization)
     :return: True if the data has changed
     """
-    if last_data is None:
-        return True
-    if cached_data is not None:
-        return cached_data != new_data
-    try:
-        cached = json.loads(last_data.data)
-        return cached != new_data
-    except (json.JSONDecodeError, TypeError) as e:
-        logger.error(f"last_data.data parsing error: {e}")
-        return True
+    return last_data is None or last_data != new_data
 
 
 async def extract_numeric_value(data: dict) -> Optional[float]:
@@ -142,19 +229,20 @@ async def extract_numeric_value(data: dict) -> Optional[float]:
 
 async def get_last_device_data(
     db_session: AsyncSession, device_id: str
-) -> Optional[SensorData]:
+) -> Optional[SensorSample]:
     """
-    Gets the latest record for the device from the database.
+    Gets the latest sample of the device from the database.
 
     :param db_session: DB session
     :param device_id: device ID
-    :return: last DeviceData entry or None
+    :return: last SensorSample entry or None
     """
     try:
         result = await db_session.execute(
-            select(SensorData)
-            .where(SensorData.device_id == device_id)
-            .order_by(SensorData.timestamp.desc())
+            select(SensorSample)
+            .join(Sensor, Sensor.id == SensorSample.sensor_id)
+            .where(Sensor.device_id == device_id)
+            .order_by(SensorSample.ts.desc())
             .limit(1)
         )
         return result.scalars().first()
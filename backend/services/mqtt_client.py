@@ -1,11 +1,12 @@
 import asyncio
-import json
 import logging
 from typing import Callable, Dict, Optional, Any
 
 import aiomqtt
 
 from core.settings import settings
+from services.topic_trie import TopicTrie
+from utils import codec
 
 logging.basicConfig(level=settings.log.level)
 logger = logging.getLogger(__name__)
@@ -27,6 +28,7 @@ class AsyncMQTTClient:
         self.identifier = client_id or "gm-gateway"
         self.client: Optional[aiomqtt.Client] = None
         self.subscriptions: Dict[str, Callable] = {}
+        self._router: TopicTrie[Callable] = TopicTrie()
         self._is_connected = False
         self._running = False
         self._reconnect_task: Optional[asyncio.Task] = None  # Задача для переподключения
@@ -75,30 +77,32 @@ class AsyncMQTTClient:
 
                         logger.debug(f"Received MQTT message: topic={topic}, qos={qos}")
 
-                        # Декодируем payload
+                        callbacks = self._router.match(topic)
+                        if not callbacks:
+                            continue
+
+                        # Разбираем payload один раз, callbacks получают и байты, и объект
+                        payload_bytes = message.payload
                         try:
-                            payload_dict = json.loads(message.payload.decode())
-                            payload_bytes = message.payload
-                        except json.JSONDecodeError:
-                            logger.warning(f"Invalid JSON in message: {message.payload}")
-                            payload_dict = None
-                            payload_bytes = message.payload
-
-                        # Поиск и вызов callback (этот блок должен быть ПОСЛЕ try/except!)
-                        for subscribed_topic, callback in self.subscriptions.items():
-                            if self._topic_matches(subscribed_topic, topic):
-                                try:
-                                    await callback(
-                                        topic=topic,
-                                        payload=payload_bytes,
-                                        qos=qos,
-                                        properties=properties,
-                                    )
-                                except Exception as e:
-                                    logger.error(
-                                        f"Error in callback for {topic}: {e}",
-                                        exc_info=True,
-                                    )
+                            data = codec.loads(payload_bytes)
+                        except (ValueError, TypeError):
+                            logger.debug(f"Payload is not JSON: {payload_bytes!r}")
+                            data = None
+
+                        for callback in callbacks:
+                            try:
+                                await callback(
+                                    topic=topic,
+                                    payload=payload_bytes,
+                                    qos=qos,
+                                    properties=properties,
+                                    data=data,
+                                )
+                            except Exception as e:
+                                logger.error(
+                                    f"Error in callback for {topic}: {e}",
+                                    exc_info=True,
+                                )
 
             except aiomqtt.MqttError as e:
                 self._is_connected = False
@@ -120,15 +124,21 @@ class AsyncMQTTClient:
     async def publish(
         self, topic: str, payload: Any, qos: int = 0, retain: bool = False
     ) -> bool:
-        """Публикует сообщение. Возвращает True при успехе."""
+        """
+        Публикует сообщение. Возвращает True при успехе.
+        bytes и str отправляются как есть, остальные объекты кодируются в JSON.
+        """
         if not self._is_connected or not self.client:
             logger.warning(f"MQTT is not connected. Skipping a publication: {topic}")
             return False
 
         try:
-            payload_str = json.dumps(payload)
-            await self.client.publish(topic, payload_str, qos=qos, retain=retain)
-            logger.debug(f"Sent by MQTT: {topic} → {payload_str}")
+            if isinstance(payload, (bytes, bytearray, str)):
+                payload_bytes = payload
+            else:
+                payload_bytes = codec.dumps(payload)
+            await self.client.publish(topic, payload_bytes, qos=qos, retain=retain)
+            logger.debug(f"Sent by MQTT: {topic} → {payload_bytes!r}")
             return True
         except aiomqtt.MqttError as e:
             self._is_connected = False
@@ -140,6 +150,7 @@ class AsyncMQTTClient:
 
     async def subscribe(self, topic: str, callback: Callable):
         """Регистрирует callback для топика."""
+        self._router.add(topic, callback)
         self.subscriptions[topic] = callback
         logger.debug(f"Subscription is registered: {topic}")
 
@@ -153,6 +164,7 @@ class AsyncMQTTClient:
                 except Exception as e:
                     logger.warning(f"Error when unsubscribing from {topic}: {e}")
             self.subscriptions.pop(topic, None)
+            self._router.remove(topic)
 
     async def disconnect(self):
         """Асинхронное отключение."""
@@ -174,15 +186,3 @@ class AsyncMQTTClient:
     @property
     def is_connected(self):
         return self._is_connected
-
-    def _topic_matches(self, pattern: str, topic: str) -> bool:
-        """Проверяет соответствие топика шаблону с MQTT-wildcard."""
-        import fnmatch
-
-        pattern = pattern.replace("#", "**").replace("+", "*")
-
-        if pattern.endswith("**"):
-            prefix = pattern[:-2]
-            return topic.startswith(prefix)
-
-        return fnmatch.fnmatch(topic, pattern)
@@ -1,10 +1,11 @@
 import asyncio
-import json
 import logging
-from typing import Callable, Optional
+from typing import Any, Callable, Optional
 
 from core.settings import settings
 from services.mqtt_client import AsyncMQTTClient
+from services.topic_trie import topic_matches
+from utils import codec
 
 logger = logging.getLogger(__name__)
 
@@ -136,22 +137,13 @@ def is_topic_match(pattern: str, topic: str) -> bool:
     :param topic: actual topic (for example, 'devices/sensor1/data')
     :return: True if the topic matches the template
     """
-    import fnmatch
-
-    # Replacing MQTT-wildcard with fnmatch templates
-    pattern = pattern.replace("#", "**").replace("+", "*")
-
-    if pattern.endswith("**"):
-        prefix = pattern[:-2]
-        return topic.startswith(prefix)
-
-    return fnmatch.fnmatch(topic, pattern)
+    return topic_matches(pattern, topic)
 
 
 async def publish_with_retry(
     mqtt_client: AsyncMQTTClient,
     topic: str,
-    payload: dict,
+    payload: Any,
     qos: int = 0,
     retain: bool = False,
     max_retries: int = 2,
@@ -162,7 +154,7 @@ async def publish_with_retry(
 
     :param mqtt_client: instance of AsyncMQTTClient
     :param topic: topic for publication
-    :param payload: data (dictionary, to be serialized in JSON)
+    :param payload: data to be serialized in JSON, or already encoded bytes
     :param qos: QoS level (0, 1, 2)
     :param retain: retain message flag
     :param max_retries: number of retries
@@ -173,17 +165,19 @@ async def publish_with_retry(
         logger.warning(f"MQTT is not connected. Skipping the publication: {topic}")
         return False
 
-    payload_str = None
     try:
-        payload_str = json.dumps(payload)
+        if isinstance(payload, (bytes, bytearray)):
+            payload_bytes = payload
+        else:
+            payload_bytes = codec.dumps(payload)
     except (TypeError, ValueError) as e:
         logger.error(f"Unable to serialize payload for {topic}: {e}")
         return False
 
     for attempt in range(max_retries + 1):
         try:
-            await mqtt_client.publish(topic, payload_str, qos=qos, retain=retain)
-            logger.debug(f"Published in MQTT: {topic} → {payload_str}")
+            await mqtt_client.publish(topic, payload_bytes, qos=qos, retain=retain)
+            logger.debug(f"Published in MQTT: {topic} → {payload_bytes!r}")
             return True
 
         except Exception as e:
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import redis.asyncio as redis
+
+from core.settings import settings
+from schemas.sensors import SensorMessage
+from services.mqtt_client import AsyncMQTTClient
+from services.mqtt_helper import publish_with_retry
+from services.redis_publisher import publish_many_to_redis
+from utils import codec
+
+logger = logging.getLogger(__name__)
+
+
+class OutboundPublisher:
+    """
+    Publishes collected readings once per batch.
+    Every reading goes to Redis in one pipeline, while MQTT gets only the
+    latest data and online state of each device. MQTT publishes run
+    concurrently, limited by an in-flight window.
+    """
+
+    def __init__(
+        self,
+        mqtt_client: Optional[AsyncMQTTClient],
+        redis_client: Optional[redis.Redis],
+        max_in_flight: Optional[int] = None,
+        qos: int = 1,
+    ):
+        """
+        :param mqtt_client: instance of AsyncMQTTClient (may be None)
+        :param redis_client: Redis client instance (may be None)
+        :param max_in_flight: maximum number of concurrent MQTT publishes
+        :param qos: QoS level of the MQTT publishes
+        """
+        self.mqtt_client = mqtt_client
+        self.redis_client = redis_client
+        self.qos = qos
+        self._in_flight = asyncio.Semaphore(
+            max_in_flight or settings.collector.max_in_flight
+        )
+        self.published = 0
+        self.coalesced = 0
+
+    async def publish(self, batch: List[SensorMessage]) -> int:
+        """
+        :param batch: readings collected since the previous call
+        :return: number of successful MQTT publishes
+        """
+        latest: Dict[str, SensorMessage] = {}
+        for message in batch:
+            latest[message.device_id] = message
+        self.coalesced += len(batch) - len(latest)
+
+        publishes = []
+        if self.mqtt_client:
+            for device_id, message in latest.items():
+                publishes.append(
+                    self._publish_mqtt(f"gm/{device_id}/data", codec.dumps(message.data))
+                )
+                publishes.append(
+                    self._publish_mqtt(
+                        f"gm/{device_id}/online", codec.dumps({"online": message.online})
+                    )
+                )
+        results = await asyncio.gather(
+            publish_many_to_redis(self.redis_client, batch),
+            *publishes,
+            return_exceptions=True,
+        )
+        sent = sum(1 for result in results[1:] if result is True)
+        self.published += sent
+        logger.debug(
+            f"Published {len(batch)} readings: {sent}/{len(publishes)} MQTT messages "
+            f"for {len(latest)} devices"
+        )
+        return sent
+
+    async def _publish_mqtt(self, topic: str, payload: bytes) -> bool:
+        async with self._in_flight:
+            return await publish_with_retry(
+                self.mqtt_client, topic, payload, qos=self.qos
+            )
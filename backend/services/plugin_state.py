@@ -0,0 +1,38 @@
+import logging
+from typing import Dict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.plugins import PluginRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class PluginStateRegistry:
+    """
+    Process-wide in-memory copy of plugin_registry.is_running.
+    Loaded once at startup and updated write-through by the CRUD layer,
+    so hot loops read a dict instead of the database.
+    """
+
+    def __init__(self):
+        self._states: Dict[str, bool] = {}
+        self.loaded = False
+
+    async def load(self, session: AsyncSession) -> None:
+        result = await session.execute(
+            select(PluginRegistry.device_id, PluginRegistry.is_running)
+        )
+        self._states = {device_id: bool(state) for device_id, state in result.all()}
+        self.loaded = True
+        logger.info(f"Plugin states loaded: {len(self._states)} plugins")
+
+    def is_running(self, device_id: str) -> bool:
+        return self._states.get(device_id, False)
+
+    def set(self, device_id: str, is_running: bool) -> None:
+        self._states[device_id] = bool(is_running)
+
+
+plugin_state = PluginStateRegistry()
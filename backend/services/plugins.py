@@ -7,8 +7,9 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.logging import log
-from crud.plugins import Plugins
 from models.plugins import PluginRegistry
+from services.plugin_state import plugin_state
+from services.response_cache import response_cache
 from plugins.template import DevicePlugin, ActuatorPlugin  # Добавлен ActuatorPlugin
 
 
@@ -67,7 +68,8 @@ async def load_plugins(db_session: AsyncSession) -> dict:
                             f"Found existing device_id: {device_id} for {registry_key}"
                         )
                         # Пропускаем, если плагин помечен как остановленный
-                        if not await Plugins.is_running(device_id):
+                        plugin_state.set(device_id, registry.is_running)
+                        if not registry.is_running:
                             continue
                     else:
                         # Создаём новую запись в БД
@@ -81,6 +83,8 @@ async def load_plugins(db_session: AsyncSession) -> dict:
                         )
                         db_session.add(registry)
                         await db_session.commit()
+                        response_cache.bump("plugins")
+                        plugin_state.set(device_id, True)
                         log.info(
                             f"Registered new device_id: {device_id} for {registry_key}"
                         )
@@ -1,6 +1,6 @@
 import asyncio
 import logging
-from typing import Optional
+from typing import List, Optional
 
 import redis.asyncio as redis
 
@@ -9,6 +9,25 @@ from schemas.sensors import SensorMessage
 logger = logging.getLogger(__name__)
 
 
+async def _check_connection(redis_client: redis.Redis, ping_interval: float) -> bool:
+    """Pings Redis at most once per ping_interval seconds."""
+    now = asyncio.get_event_loop().time()
+    last_ping = getattr(redis_client, "_last_redis_ping", 0.0)
+    if now - last_ping < ping_interval:
+        return True
+    try:
+        await redis_client.ping()
+        redis_client._last_redis_ping = now
+        logger.debug("Redis connection checked (ping)")
+        return True
+    except (redis.ConnectionError, redis.TimeoutError) as e:
+        logger.error(f"Connection verification with Redis failed: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"Unexpected error when checking Redis: {type(e).__name__}: {e}")
+        return False
+
+
 async def publish_to_redis(
     redis_client: Optional[redis.Redis],
     message: SensorMessage,
@@ -31,19 +50,8 @@ async def publish_to_redis(
     if not redis_client:
         logger.warning("Redis client not initialized, publication skipped")
         return False
-    now = asyncio.get_event_loop().time()
-    last_ping = getattr(redis_client, "_last_redis_ping", 0.0)
-    if now - last_ping >= ping_interval:
-        try:
-            await redis_client.ping()
-            redis_client._last_redis_ping = now
-            logger.debug("Redis connection checked (ping)")
-        except (redis.ConnectionError, redis.TimeoutError) as e:
-            logger.error(f"Connection verification with Redis failed: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"Unexpected error when checking Redis: {type(e).__name__}: {e}")
-            return False
+    if not await _check_connection(redis_client, ping_interval):
+        return False
     try:
         payload = message.model_dump_json()
     except Exception as e:
@@ -76,6 +84,68 @@ async def publish_to_redis(
     return False
 
 
+async def publish_many_to_redis(
+    redis_client: Optional[redis.Redis],
+    messages: List[SensorMessage],
+    channel: str = "sensor_updates",
+    max_retries: int = 2,
+    retry_delay: float = 0.5,
+    ping_interval: float = 10.0,
+) -> int:
+    """
+    Publishes a batch of messages to Redis in one round trip (pipeline).
+
+    :param redis_client: Redis client instance (may be None)
+    :param messages: messages to publish
+    :param channel: Redis channel to publish
+    :param max_retries: maximum number of retries in case of error
+    :param retry_delay: delay between retries (in seconds)
+    :param ping_interval: Redis connection verification interval (in seconds)
+    :return: number of published messages
+    """
+    if not messages:
+        return 0
+    if not redis_client:
+        logger.warning("Redis client not initialized, publication skipped")
+        return 0
+    if not await _check_connection(redis_client, ping_interval):
+        return 0
+    payloads = []
+    for message in messages:
+        try:
+            payloads.append(message.model_dump_json())
+        except Exception as e:
+            logger.error(f"Failed to serialize message for Redis: {e}")
+    for attempt in range(max_retries + 1):
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for payload in payloads:
+                pipe.publish(channel, payload)
+            await pipe.execute()
+            logger.debug(f"Sent to Redis: {channel} → {len(payloads)} messages")
+            return len(payloads)
+
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            if attempt < max_retries:
+                logger.warning(
+                    f"Redis error (attempt {attempt + 1}/{max_retries}): {e}. "
+                    f" Will be repeated after {retry_delay} with."
+                )
+                await asyncio.sleep(retry_delay)
+            else:
+                logger.error("Exceeded the number of attempts to publish in Redis")
+                return 0
+
+        except Exception as e:
+            logger.error(
+                f"Unexpected error when publishing in Redis: {type(e).__name__}: {e}",
+                exc_info=True,
+            )
+            return 0
+
+    return 0
+
+
 async def is_redis_connected(
     redis_client: Optional[redis.Redis], ping_timeout: float = 5.0
 ) -> bool:
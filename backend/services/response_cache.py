@@ -0,0 +1,90 @@
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class Entry(NamedTuple):
+    version: int
+    body: bytes
+
+
+class ResponseCache:
+    """
+    Serialized responses of the read endpoints the dashboard polls, keyed by
+    resource ("sensors", "actuators", "plugins", "layouts").
+    Every resource has a version counter that writers bump after commit.
+    A cached body is served while its version is current, and a request
+    whose If-None-Match holds the current ETag gets 304; neither touches
+    the database.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._entries: Dict[str, Entry] = {}
+        self._adapters: Dict[Any, TypeAdapter] = {}
+        # Versions restart with the process, the tag keeps old ETags invalid
+        self._tag = os.urandom(4).hex()
+
+    def version(self, resource: str) -> int:
+        return self._versions.get(resource, 0)
+
+    def etag(self, resource: str) -> str:
+        return f'"{resource}-{self._tag}-{self.version(resource)}"'
+
+    def bump(self, *resources: str) -> None:
+        for resource in resources:
+            self._versions[resource] = self.version(resource) + 1
+
+    async def respond(
+        self,
+        request: Request,
+        resource: str,
+        response_type: Any,
+        load: Callable[[], Awaitable[Any]],
+    ) -> Response:
+        """
+        Response of a cached read endpoint.
+
+        :param request: incoming request, for If-None-Match
+        :param resource: resource name the writers bump
+        :param response_type: type the endpoint returns, used to serialize it
+        :param load: coroutine function reading the resource on a cache miss,
+            may return the JSON body itself
+        """
+        version, etag = self.version(resource), self.etag(resource)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        entry = self._entries.get(resource)
+        if entry is None or entry.version != version:
+            body = await load()
+            if not isinstance(body, bytes):
+                adapter = self._adapters.get(response_type)
+                if adapter is None:
+                    adapter = self._adapters[response_type] = TypeAdapter(response_type)
+                body = adapter.dump_json(body, by_alias=True)
+            # Stored under the version read before loading: a write that
+            # bumps it meanwhile makes the next request reload
+            entry = Entry(version, body)
+            self._entries[resource] = entry
+            logger.debug(f"Response cache of {resource} rebuilt at version {version}")
+        return Response(entry.body, media_type="application/json", headers=headers)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+response_cache = ResponseCache()
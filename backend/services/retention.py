@@ -0,0 +1,169 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import ColumnCollection, ColumnElement, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.settings import settings
+from crud.sensors import SensorDataCRUD
+from db.database import async_session_context
+from db.partitions import partition_router
+from models import Sensor, SensorRollup, SensorSample, SensorSampleRaw
+from utils.helpers import to_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+Criteria = Callable[[ColumnCollection], List[ColumnElement[bool]]]
+Rule = Tuple[str, int, Criteria]
+
+
+class RetentionService:
+    """
+    Background job that expires sensor_samples history.
+    Drops whole day partitions that are older than every retention period,
+    deletes the remaining expired rows in bounded chunks and compacts the
+    database afterwards, so ingest never waits for retention.
+    """
+
+    def __init__(
+        self,
+        keep_data: Optional[int] = None,
+        devices: Optional[Dict[str, int]] = None,
+        units: Optional[Dict[str, int]] = None,
+        interval: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ):
+        """
+        :param keep_data: default retention in days
+        :param devices: retention overrides in days per device_id
+        :param units: retention overrides in days per measure unit
+        :param interval: pause between runs (in seconds)
+        :param chunk_size: maximum number of rows deleted per statement
+        """
+        self.keep_data = keep_data or settings.app_settings.keep_data
+        self.devices = devices if devices is not None else settings.retention.devices
+        self.units = units if units is not None else settings.retention.units
+        self.interval = interval or settings.retention.interval
+        self.chunk_size = chunk_size or settings.retention.chunk_size
+        self._is_running = False
+
+    def _rules(self) -> List[Rule]:
+        """
+        Retention rules in priority order: device overrides, unit overrides
+        (for devices without their own override), then the default period.
+        Criteria are built per table, because every day partition is a table;
+        devices and units are resolved to sensor ids through the sensors table.
+        """
+        devices, units = list(self.devices), list(self.units)
+
+        def sensors(*criteria: ColumnElement[bool]):
+            return select(Sensor.id).where(*criteria)
+
+        def device_rule(device_id: str) -> Criteria:
+            return lambda c: [c.sensor_id.in_(sensors(Sensor.device_id == device_id))]
+
+        def unit_rule(unit: str) -> Criteria:
+            criteria = [Sensor.unit == unit]
+            if devices:
+                criteria.append(Sensor.device_id.not_in(devices))
+            return lambda c: [c.sensor_id.in_(sensors(*criteria))]
+
+        def default_rule(c: ColumnCollection) -> List[ColumnElement[bool]]:
+            overrides = []
+            if devices:
+                overrides.append(Sensor.device_id.in_(devices))
+            if units:
+                overrides.append(Sensor.unit.in_(units))
+            if not overrides:
+                return []
+            return [c.sensor_id.not_in(sensors(or_(*overrides)))]
+
+        rules: List[Rule] = []
+        for device_id, days in self.devices.items():
+            rules.append((f"device {device_id}", days, device_rule(device_id)))
+        for unit, days in self.units.items():
+            rules.append((f"unit {unit}", days, unit_rule(unit)))
+        rules.append(("default", self.keep_data, default_rule))
+        return rules
+
+    async def run(self) -> None:
+        self._is_running = True
+        logger.info(f"Retention job started, interval {self.interval} s")
+        try:
+            while self._is_running:
+                try:
+                    await self.run_once()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Retention run failed: {e}", exc_info=True)
+                await asyncio.sleep(self.interval)
+        except asyncio.CancelledError:
+            logger.info("Retention job cancelled")
+
+    def stop(self) -> None:
+        self._is_running = False
+
+    async def run_once(self) -> int:
+        """
+        Runs every retention rule once.
+
+        :return: number of deleted rows
+        """
+        total = 0
+        now = datetime.now(timezone.utc)
+        rules = self._rules()
+        async with async_session_context() as session:
+            # Partitions older than the longest period hold only expired rows
+            longest = max(days for _, days, _ in rules)
+            dropped = await partition_router.drop_before(
+                session, to_epoch_ms(now - timedelta(days=longest))
+            )
+            await session.commit()
+            if dropped:
+                logger.info(f"Retention: partitions dropped: {', '.join(dropped)}")
+            for label, days, criteria in rules:
+                cutoff = to_epoch_ms(now - timedelta(days=days))
+                deleted = 0
+                tables = partition_router.tables(session, end=cutoff)
+                for table in [
+                    *tables,
+                    SensorSampleRaw.__table__,
+                    SensorRollup.__table__,
+                ]:
+                    while True:
+                        count = await SensorDataCRUD.delete_expired(
+                            session, table, cutoff, self.chunk_size, *criteria(table.c)
+                        )
+                        deleted += count
+                        if count < self.chunk_size:
+                            break
+                        # Give the collectors a chance to write between chunks
+                        await asyncio.sleep(0)
+                if deleted:
+                    logger.info(f"Retention ({label}, {days} d): {deleted} rows deleted")
+                total += deleted
+            if total or dropped:
+                await self._compact(session)
+        return total
+
+    async def _compact(self, session: AsyncSession) -> None:
+        if session.bind.dialect.name == "sqlite":
+            auto_vacuum = (await session.execute(text("PRAGMA auto_vacuum"))).scalar()
+            if auto_vacuum == 2:
+                # sqlite3 steps a statement only once via execute(), which frees
+                # a single page; executescript() runs the pragma to completion
+                connection = await session.connection()
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.executescript(
+                    "PRAGMA incremental_vacuum;"
+                )
+            else:
+                logger.debug("auto_vacuum is not INCREMENTAL, free pages are kept")
+            # sensor_samples is a view over the day partitions here
+            await session.execute(text("PRAGMA optimize"))
+        else:
+            await session.execute(text(f"ANALYZE {SensorSample.__tablename__}"))
+        await session.commit()
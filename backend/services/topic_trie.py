@@ -0,0 +1,146 @@
+from typing import Dict, Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+SINGLE_LEVEL = "+"
+MULTI_LEVEL = "#"
+
+
+def validate_topic_filter(pattern: str) -> None:
+    """
+    Checks that the topic filter follows the MQTT rules for wildcards:
+    '+' occupies a whole level, '#' occupies a whole level and is the last one.
+
+    :raises ValueError: if the filter is invalid
+    """
+    if not pattern:
+        raise ValueError("Topic filter cannot be empty")
+    levels = pattern.split("/")
+    for i, level in enumerate(levels):
+        if MULTI_LEVEL in level and (level != MULTI_LEVEL or i != len(levels) - 1):
+            raise ValueError(f"'#' must be the last level of the filter: {pattern}")
+        if SINGLE_LEVEL in level and level != SINGLE_LEVEL:
+            raise ValueError(f"'+' must occupy a whole level of the filter: {pattern}")
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """
+    Checks whether the topic matches the filter according to the MQTT spec.
+
+    :param pattern: topic filter (for example, 'devices/+/data')
+    :param topic: actual topic (for example, 'devices/sensor1/data')
+    :return: True if the topic matches the filter
+    """
+    pattern_levels = pattern.split("/")
+    topic_levels = topic.split("/")
+    if topic.startswith("$") and pattern_levels[0] in (SINGLE_LEVEL, MULTI_LEVEL):
+        return False
+    for i, level in enumerate(pattern_levels):
+        if level == MULTI_LEVEL:
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != SINGLE_LEVEL and level != topic_levels[i]:
+            return False
+    return len(pattern_levels) == len(topic_levels)
+
+
+class _Node(Generic[T]):
+    __slots__ = ("children", "value", "has_value")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node[T]"] = {}
+        self.value: Optional[T] = None
+        self.has_value = False
+
+
+class TopicTrie(Generic[T]):
+    """
+    Subscription trie keyed by topic levels.
+    match() walks the trie once per topic level, so dispatch cost depends
+    on the topic depth instead of the number of subscriptions.
+    """
+
+    def __init__(self):
+        self._root: _Node[T] = _Node()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, pattern: str) -> bool:
+        node = self._find(pattern)
+        return node is not None and node.has_value
+
+    def add(self, pattern: str, value: T) -> None:
+        """Adds a subscription, replacing the value of an existing one."""
+        validate_topic_filter(pattern)
+        node = self._root
+        for level in pattern.split("/"):
+            node = node.children.setdefault(level, _Node())
+        if not node.has_value:
+            self._size += 1
+        node.value = value
+        node.has_value = True
+
+    def remove(self, pattern: str) -> bool:
+        """
+        Removes a subscription and prunes empty branches.
+
+        :return: True if the subscription existed
+        """
+        path = [self._root]
+        levels = pattern.split("/")
+        for level in levels:
+            child = path[-1].children.get(level)
+            if child is None:
+                return False
+            path.append(child)
+        node = path[-1]
+        if not node.has_value:
+            return False
+        node.value = None
+        node.has_value = False
+        self._size -= 1
+        for level, parent, child in zip(
+            reversed(levels), reversed(path[:-1]), reversed(path[1:])
+        ):
+            if child.children or child.has_value:
+                break
+            del parent.children[level]
+        return True
+
+    def match(self, topic: str) -> List[T]:
+        """Returns the values of all subscriptions matching the topic."""
+        levels = topic.split("/")
+        depth = len(levels)
+        result: List[T] = []
+        stack: List[Tuple[_Node[T], int]] = [(self._root, 0)]
+        while stack:
+            node, i = stack.pop()
+            # Wildcards in the first level do not match topics starting with '$'
+            wildcards_allowed = i > 0 or not topic.startswith("$")
+            if wildcards_allowed:
+                multi = node.children.get(MULTI_LEVEL)
+                if multi is not None and multi.has_value:
+                    result.append(multi.value)
+            if i == depth:
+                if node.has_value:
+                    result.append(node.value)
+                continue
+            child = node.children.get(levels[i])
+            if child is not None:
+                stack.append((child, i + 1))
+            if wildcards_allowed:
+                single = node.children.get(SINGLE_LEVEL)
+                if single is not None:
+                    stack.append((single, i + 1))
+        return result
+
+    def _find(self, pattern: str) -> Optional[_Node[T]]:
+        node = self._root
+        for level in pattern.split("/"):
+            node = node.children.get(level)
+            if node is None:
+                return None
+        return node
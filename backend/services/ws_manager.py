@@ -1,5 +1,4 @@
 import asyncio
-import json
 import logging
 from typing import List
 
@@ -8,6 +7,7 @@ from fastapi import WebSocket
 
 from core.settings import settings
 from schemas.sensors import SensorMessage  # ваш класс сообщения
+from utils import codec
 
 logger = logging.getLogger(__name__)
 
@@ -45,10 +45,10 @@ class WebSocketManager:
                 message = await pubsub.get_message(ignore_subscribe_messages=True)
                 if message and message["type"] == "message":
                     try:
-                        data = json.loads(message["data"])
+                        data = codec.loads(message["data"])
                         sensor_msg = SensorMessage(**data)  # Парсим в SensorMessage
                         await self._broadcast(sensor_msg)
-                    except (json.JSONDecodeError, TypeError) as e:
+                    except (ValueError, TypeError) as e:
                         logger.error(f"Could not parse message from Redis: {e}")
         except Exception as e:
             logger.error(f"Redis listener error: {e}", exc_info=True)
@@ -6,11 +6,10 @@ from typing import Optional, List, Dict, Any
 
 import redis.asyncio as redis
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from crud.actuators import ActuatorCRUD
 from crud.sensors import SensorDataCRUD
-from db.database import engine
+from db.database import session_factory
 from models import PluginRegistry
 from schemas.actuators import ActuatorUpdate, ActuatorCommandCreate
 from schemas.automations import (
@@ -36,9 +35,9 @@ class AutomationEngine:
         redis_client: redis.Redis = None,
         actuator_manager: ActuatorManager = None,
         automations: list[Automation] = None,
-        db_session: Optional[AsyncSession] = None,
     ):
-        self.db_session = db_session or AsyncSession(bind=engine)
+        # Сессия БД открывается на каждую операцию (session_factory), движок
+        # вызывается и из API, поэтому общую сессию держать нельзя
         self.redis_client = redis_client
         self.actuator_manager = actuator_manager
         self.automations = {a.id: a for a in automations} if automations else None
@@ -231,7 +230,8 @@ class AutomationEngine:
         await self.redis_client.set(key, str(value))
 
     async def _get_sensor_value_from_db(self, sensor_id: str) -> Optional[float]:
-        return await SensorDataCRUD.get_value(sensor_id, self.db_session)
+        async with session_factory() as session:
+            return await SensorDataCRUD.get_value(sensor_id, session)
 
     async def _send_notification(self, recipient: str, message: str):
         """Отправляет уведомление (реализацию можно расширить)."""
@@ -243,11 +243,12 @@ class AutomationEngine:
         :param device_id: ID устройства из БД
         :param state: True — включить, False — выключить
         """
-        device = await ActuatorCRUD.get(device_id=device_id, session=self.db_session)
+        async with session_factory() as session:
+            device = await ActuatorCRUD.get(device_id=device_id, session=session)
         command = {"action": "set_state", "state": state}
         redis_message = SensorMessage(
             device_id=device_id,
-            timestamp=datetime.now().isoformat(),
+            timestamp=datetime.now().astimezone().isoformat(),
             data=command,
             value=1 if state else 0,
             unit="boolean",
@@ -281,13 +282,14 @@ class AutomationEngine:
                 is_active=state,
                 updated_at=datetime.now(),
             )
-            await ActuatorCRUD.update(actuator=actuator, session=self.db_session)
             commands = ActuatorCommandCreate(
                 device_id=device_id,
                 command=str(command),
                 success=True,
             )
-            await ActuatorCRUD.add_command(commands=commands, session=self.db_session)
+            async with session_factory() as session:
+                await ActuatorCRUD.update(actuator=actuator, session=session)
+                await ActuatorCRUD.add_command(commands=commands, session=session)
             logger.info(
                 f"Device {device_id} turned {'on' if state else 'off'} via plugin"
             )
@@ -299,7 +301,8 @@ class AutomationEngine:
                 success=False,
                 error_message=str(e),
             )
-            await ActuatorCRUD.add_command(commands=commands, session=self.db_session)
+            async with session_factory() as session:
+                await ActuatorCRUD.add_command(commands=commands, session=session)
             if plugin and plugin._initialized:
                 await plugin.cleanup()
             logger.error(f"Failed to control device {device_id}: {e}", exc_info=True)
@@ -310,10 +313,11 @@ class AutomationEngine:
         :return: экземпляр плагина или None
         """
 
-        result = await self.db_session.execute(
-            select(PluginRegistry).where(PluginRegistry.device_id == device_id)
-        )
-        registry = result.scalars().first()
+        async with session_factory() as session:
+            result = await session.execute(
+                select(PluginRegistry).where(PluginRegistry.device_id == device_id)
+            )
+            registry = result.scalars().first()
 
         if not registry:
             logger.warning(f"No plugin registry entry for device_id={device_id}")
@@ -0,0 +1,100 @@
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Sequence, Union
+
+from pydantic_core import to_json
+
+logger = logging.getLogger(__name__)
+
+Raw = Union[bytes, bytearray, memoryview, str]
+
+# orjson.JSONDecodeError is a subclass of json.JSONDecodeError,
+# so callers catch the same exception whichever backend is active
+DecodeError = json.JSONDecodeError
+
+
+class Backend(NamedTuple):
+    name: str
+    loads: Callable[[Raw], Any]
+    dumps: Callable[[Any], bytes]
+    # Serializer of response rows, which may hold datetimes
+    dumps_rows: Callable[[Any], bytes]
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(data: Raw) -> Any:
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+# Without orjson, rows go through pydantic-core: several times faster than the
+# json module and it writes datetimes the way Pydantic models do
+BACKENDS: Dict[str, Backend] = {
+    "json": Backend("json", _json_loads, _json_dumps, to_json)
+}
+
+try:
+    import orjson
+
+    def _orjson_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def _orjson_dumps_rows(obj: Any) -> bytes:
+        # Pydantic writes UTC datetimes with a "Z" suffix as well
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+
+    BACKENDS["orjson"] = Backend(
+        "orjson", orjson.loads, _orjson_dumps, _orjson_dumps_rows
+    )
+except ImportError:
+    pass
+
+backend: Backend = BACKENDS.get("orjson", BACKENDS["json"])
+
+
+def set_backend(name: str) -> Backend:
+    """
+    Switches the active backend (used by benchmarks and tests).
+
+    :param name: 'orjson' or 'json'
+    :return: the previously active backend
+    :raises ValueError: if the backend is not available
+    """
+    global backend
+    if name not in BACKENDS:
+        raise ValueError(f"JSON backend '{name}' is not available")
+    previous, backend = backend, BACKENDS[name]
+    logger.debug(f"JSON backend switched to {name}")
+    return previous
+
+
+def loads(data: Raw) -> Any:
+    """
+    Parses JSON from bytes or str without decoding bytes to str first.
+
+    :raises DecodeError: if the data is not valid JSON
+    """
+    return backend.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serializes an object to compact UTF-8 JSON bytes."""
+    return backend.dumps(obj)
+
+
+def dumps_rows(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> bytes:
+    """
+    Serializes row tuples as a JSON array of objects with the given keys:
+    the fast path of list endpoints, with no model per row. Values must
+    be JSON types or datetimes (written as ISO 8601, like Pydantic).
+    """
+    return backend.dumps_rows([dict(zip(keys, row)) for row in rows])
+
+
+def dumps_str(obj: Any) -> str:
+    """Serializes an object to a compact JSON string (for text columns)."""
+    return backend.dumps(obj).decode("utf-8")
@@ -7,6 +7,7 @@ import redis.asyncio as redis
 from collectors.data_collector import DataCollector
 from core.settings import settings
 from db.database import async_session_context
+from services.plugin_state import plugin_state
 from services.plugins import load_plugins
 
 logger = logging.getLogger(__name__)
@@ -35,6 +36,8 @@ async def restart_collector():
 
     # 2. Перезагружаем плагины
     async with async_session_context() as db_session:
+        if not plugin_state.loaded:
+            await plugin_state.load(db_session)
         loaded_plugins = await load_plugins(db_session)
         plugins.clear()
         plugins.update(loaded_plugins)
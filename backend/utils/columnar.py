@@ -0,0 +1,136 @@
+"""
+Binary columnar encoding of sensor history, negotiated with
+``Accept: application/vnd.gm.columnar`` (``; precision=32`` for float32
+values).
+
+Little-endian layout::
+
+    b"GMC1"  u8 value width (4 or 8)  u8[3] padding  u32 series count
+    per series:
+        u16 length + UTF-8 device_id
+        u16 length + UTF-8 unit (0 — no unit)
+        u32 resolution in seconds (0 — raw samples)
+        u32 point count
+        padding to a multiple of 8 bytes from the start of the body
+        i64[count] timestamps (Unix epoch ms, UTC, as in the history tables)
+        f32/f64[count] values (NaN — no value)
+        padding to a multiple of 8 bytes
+
+The columns are aligned, so a client can view them with BigInt64Array and
+Float32Array/Float64Array without copying.
+"""
+
+import math
+import struct
+import sys
+from array import array
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+MEDIA_TYPE = "application/vnd.gm.columnar"
+MAGIC = b"GMC1"
+
+_LITTLE = sys.byteorder == "little"
+
+
+def negotiate(accept: Optional[str]) -> Optional[int]:
+    """
+    Value width (4 or 8 bytes) if the Accept header asks for the columnar
+    encoding, None for JSON.
+    """
+    if not accept:
+        return None
+    for item in accept.split(","):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        if media_type.lower() != MEDIA_TYPE:
+            continue
+        params = dict(param.partition("=")[::2] for param in params)
+        try:
+            if float(params.get("q", 1)) == 0:
+                return None
+        except ValueError:
+            pass
+        return 4 if params.get("precision", "").strip() == "32" else 8
+    return None
+
+
+def content_type(width: int) -> str:
+    return f"{MEDIA_TYPE}; precision={width * 8}"
+
+
+Series = Tuple[
+    str, Optional[str], Optional[int], Sequence[int], Sequence[Optional[float]]
+]
+
+
+def encode(series: Iterable[Series], width: int = 8) -> bytes:
+    """
+    :param series: (device_id, unit, resolution, timestamps, values) per sensor
+    :param width: 4 for float32 values, 8 for float64
+    """
+    items = list(series)
+    body = bytearray(MAGIC)
+    body += struct.pack("<B3xI", width, len(items))
+    for device_id, unit, resolution, timestamps, values in items:
+        for text in (device_id, unit or ""):
+            raw = text.encode("utf-8")
+            body += struct.pack("<H", len(raw)) + raw
+        body += struct.pack("<II", resolution or 0, len(timestamps))
+        _pad(body)
+        body += _column("q", timestamps)
+        body += _column(
+            "f" if width == 4 else "d",
+            (math.nan if value is None else value for value in values),
+        )
+        _pad(body)
+    return bytes(body)
+
+
+def decode(body: bytes) -> List[Series]:
+    """Inverse of encode, NaN values come back as None."""
+    if body[:4] != MAGIC:
+        raise ValueError("Not a columnar body")
+    width, count = struct.unpack_from("<B3xI", body, 4)
+    offset, series = 12, []
+    for _ in range(count):
+        texts = []
+        for _ in range(2):
+            (size,) = struct.unpack_from("<H", body, offset)
+            texts.append(body[offset + 2 : offset + 2 + size].decode("utf-8"))
+            offset += 2 + size
+        resolution, points = struct.unpack_from("<II", body, offset)
+        offset += 8
+        offset += -offset % 8
+        timestamps = _read("q", body, offset, points)
+        offset += points * 8
+        values = _read("f" if width == 4 else "d", body, offset, points)
+        offset += points * width
+        offset += -offset % 8
+        series.append(
+            (
+                texts[0],
+                texts[1] or None,
+                resolution or None,
+                list(timestamps),
+                [None if math.isnan(value) else value for value in values],
+            )
+        )
+    return series
+
+
+def _read(typecode: str, body: bytes, offset: int, count: int) -> array:
+    column = array(typecode)
+    column.frombytes(body[offset : offset + count * column.itemsize])
+    if not _LITTLE:
+        column.byteswap()
+    return column
+
+
+def _column(typecode: str, values: Iterable) -> bytes:
+    column = array(typecode, values)
+    if not _LITTLE:
+        column.byteswap()
+    return column.tobytes()
+
+
+def _pad(body: bytearray) -> None:
+    body += bytes(-len(body) % 8)
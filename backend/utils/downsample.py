@@ -0,0 +1,74 @@
+from array import array
+from typing import List, Sequence
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Source points per requested point: history with max_points is read at a
+# resolution that leaves LTTB this many candidates to choose from
+OVERSAMPLE = 4
+
+
+def lttb(x: Sequence[float], y: Sequence[float], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Keeps the first and the last point and, from every bucket in between,
+    the point forming the largest triangle with the point kept from the
+    previous bucket and the average of the next one, so peaks survive.
+    Uses numpy when it is installed, array-backed columns otherwise.
+
+    :param x: monotonic x values (timestamps), ascending or descending
+    :param y: values, without None
+    :param threshold: number of points to keep
+    :return: ascending indices of the kept points
+    """
+    size = len(x)
+    if threshold >= size:
+        return list(range(size))
+    if threshold <= 2:
+        return [0, size - 1][:threshold]
+    if numpy is not None:
+        return _lttb_numpy(numpy.asarray(x, float), numpy.asarray(y, float), threshold)
+    return _lttb_python(array("d", x), array("d", y), threshold)
+
+
+def _buckets(size: int, threshold: int):
+    every = (size - 2) / (threshold - 2)
+    for i in range(threshold - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        yield start, end, end, min(int((i + 2) * every) + 1, size)
+
+
+def _lttb_python(x: array, y: array, threshold: int) -> List[int]:
+    size = len(x)
+    kept, a = [0], 0
+    for start, end, next_start, next_end in _buckets(size, threshold):
+        count = next_end - next_start
+        avg_x = sum(x[next_start:next_end]) / count
+        avg_y = sum(y[next_start:next_end]) / count
+        ax, ay = x[a], y[a]
+        a = max(
+            range(start, end),
+            key=lambda j: abs((ax - avg_x) * (y[j] - ay) - (ax - x[j]) * (avg_y - ay)),
+        )
+        kept.append(a)
+    kept.append(size - 1)
+    return kept
+
+
+def _lttb_numpy(x, y, threshold: int) -> List[int]:
+    size = len(x)
+    kept, a = [0], 0
+    for start, end, next_start, next_end in _buckets(size, threshold):
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        ax, ay = x[a], y[a]
+        areas = numpy.abs(
+            (ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay)
+        )
+        a = start + int(areas.argmax())
+        kept.append(a)
+    kept.append(size - 1)
+    return kept
@@ -0,0 +1,20 @@
+from datetime import datetime, timedelta, timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+DAY_MS = 86_400_000
+
+
+def to_epoch_ms(moment: datetime) -> int:
+    """
+    Milliseconds since the Unix epoch, the timestamp of the history tables.
+    A naive datetime is taken as local time (what datetime.now() returns),
+    its fold attribute picks the instant of a repeated DST hour.
+    """
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    return (moment - EPOCH) // timedelta(milliseconds=1)
+
+
+def from_epoch_ms(ms: int) -> datetime:
+    """Inverse of to_epoch_ms: an aware datetime in the local timezone."""
+    return (EPOCH + timedelta(milliseconds=ms)).astimezone()
@@ -0,0 +1,61 @@
+"""
+Ingest throughput of services.batch_saver.save_batch_to_db.
+
+    python benchmarks/bench_batch_saver.py --sensors 50 --batches 200 --batch-size 50
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import common  # noqa: F401  (environment bootstrap)
+from db.database import async_session_context, init_db
+from schemas.sensors import SensorMessage
+from services.batch_saver import save_batch_to_db
+
+
+def make_batches(sensors: int, batches: int, batch_size: int):
+    start = datetime.now() - timedelta(hours=1)
+    for b in range(batches):
+        batch = []
+        for i in range(batch_size):
+            value = round(random.uniform(0, 100), 2)
+            batch.append(
+                SensorMessage(
+                    device_id=f"BENCH_{(b * batch_size + i) % sensors}",
+                    timestamp=(
+                        start + timedelta(milliseconds=b * batch_size + i)
+                    ).isoformat(),
+                    data={"value": value, "unit": "celsius"},
+                    value=value,
+                    unit="celsius",
+                    online=True,
+                )
+            )
+        yield batch
+
+
+async def main(args):
+    await init_db()
+    batches = list(make_batches(args.sensors, args.batches, args.batch_size))
+    total = args.batches * args.batch_size
+    async with async_session_context() as session:
+        started = time.perf_counter()
+        saved = 0
+        for batch in batches:
+            saved += await save_batch_to_db(session, batch)
+        elapsed = time.perf_counter() - started
+    print(
+        f"{total} messages ({saved} rows inserted) in {elapsed:.2f} s: "
+        f"{total / elapsed:,.0f} rows/s, {elapsed / args.batches * 1000:.2f} ms/batch"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sensors", type=int, default=50)
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
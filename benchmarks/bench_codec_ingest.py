@@ -0,0 +1,100 @@
+"""
+CPU cost of the MQTT ingest path per message: parsing in AsyncMQTTClient and
+MQTTCollector, encoding the stored row, the Redis payload and the WebSocket
+fan-out. Compares the previous double-decode path (stdlib json) with the
+single-pass codec under every available backend.
+
+    python benchmarks/bench_codec_ingest.py --messages 20000 --keys 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+
+import common
+
+os.environ["GM__COLLECTOR__QUEUE_SIZE"] = "1000000"
+
+from collectors.mqtt_collector import MQTTCollector
+from utils import codec
+
+
+def make_payloads(count: int, keys: int):
+    payloads = []
+    for i in range(count):
+        body = {
+            f"sensor{k}": {"value": round(20 + (i + k) % 100 / 10, 2), "unit": "celsius"}
+            for k in range(keys)
+        }
+        body["online"] = True
+        payloads.append((f"devices/dev{i % 50}/data", json.dumps(body).encode()))
+    return payloads
+
+
+def legacy_fan_out(batch):
+    for message in batch:
+        json.dumps(message.data)
+        raw = message.model_dump_json()
+        json.dumps(json.loads(raw))
+
+
+def codec_fan_out(batch):
+    for message in batch:
+        codec.dumps_str(message.data)
+        raw = message.model_dump_json().encode()
+        codec.loads(raw).get("device_id")
+        raw.decode("utf-8")
+
+
+async def legacy_ingest(collector, payloads):
+    # AsyncMQTTClient parsed the payload and dropped the result,
+    # MQTTCollector decoded it to str and parsed it again
+    for topic, payload in payloads:
+        json.loads(payload.decode())
+        await collector._on_message(
+            topic, payload, 0, None, data=json.loads(payload.decode())
+        )
+
+
+async def codec_ingest(collector, payloads):
+    for topic, payload in payloads:
+        await collector._on_message(topic, payload, 0, None, data=codec.loads(payload))
+
+
+def take_batch(collector):
+    batch = []
+    queue = collector._queue._queue
+    while not queue.empty():
+        batch.append(queue.get_nowait())
+    return batch
+
+
+async def main(args):
+    payloads = make_payloads(args.messages, args.keys)
+    readings = args.messages * args.keys
+    print(
+        f"{args.messages} messages x {args.keys} readings, backends: {list(codec.BACKENDS)}"
+    )
+
+    collector = MQTTCollector()
+    with common.timer("legacy json: parse", args.messages):
+        await legacy_ingest(collector, payloads)
+    batch = take_batch(collector)
+    with common.timer("legacy json: store/redis/websocket", readings):
+        legacy_fan_out(batch)
+
+    for name in codec.BACKENDS:
+        codec.set_backend(name)
+        with common.timer(f"codec {name}: parse", args.messages):
+            await codec_ingest(collector, payloads)
+        batch = take_batch(collector)
+        with common.timer(f"codec {name}: store/redis/websocket", readings):
+            codec_fan_out(batch)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
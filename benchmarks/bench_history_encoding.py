@@ -0,0 +1,95 @@
+"""
+Payload size and encode time of a history response: the JSON list of
+SensorDataReadSchema served today, the same JSON gzipped the way
+GZipMiddleware does it, and the columnar encoding with float64 and float32
+values, plain and gzipped.
+
+    python benchmarks/bench_history_encoding.py --points 5000 --repeat 20
+"""
+
+import argparse
+import gzip
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import common  # noqa: F401  (environment bootstrap)
+
+from pydantic import TypeAdapter
+
+from core.settings import settings
+from schemas.sensors import SensorDataReadSchema
+from utils import columnar
+from utils.helpers import to_epoch_ms
+
+
+def make_items(points: int) -> List[SensorDataReadSchema]:
+    start = datetime.now().replace(microsecond=0)
+    return [
+        SensorDataReadSchema(
+            device_id="DS18B20_0000000000a1",
+            timestamp=start - timedelta(seconds=10 * i, milliseconds=i % 1000),
+            value=round(random.uniform(15, 30), 2),
+            unit="celsius",
+        )
+        for i in range(points)
+    ]
+
+
+def measure(label: str, encode, repeat: int, baseline: int = 0) -> int:
+    body = encode()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encode()
+    elapsed = (time.perf_counter() - started) / repeat
+    ratio = f" {len(body) / baseline * 100:6.1f} %" if baseline else ""
+    print(f"{label:<28} {len(body):>10,} B{ratio} {elapsed * 1000:8.2f} ms")
+    return len(body)
+
+
+def main(args):
+    items = make_items(args.points)
+    adapter = TypeAdapter(List[SensorDataReadSchema])
+    level = settings.app_settings.gzip_level
+
+    def as_json() -> bytes:
+        return adapter.dump_json(items)
+
+    def as_columnar(width: int):
+        def encode() -> bytes:
+            series = (
+                items[0].device_id,
+                items[0].unit,
+                None,
+                [to_epoch_ms(item.timestamp) for item in items],
+                [item.value for item in items],
+            )
+            return columnar.encode([series], width)
+
+        return encode
+
+    print(f"{args.points:,} points, gzip level {level}")
+    baseline = measure("JSON (SensorDataReadSchema)", as_json, args.repeat)
+    measure(
+        "JSON + gzip",
+        lambda: gzip.compress(as_json(), level),
+        args.repeat,
+        baseline,
+    )
+    for width in (8, 4):
+        encode = as_columnar(width)
+        measure(f"columnar float{width * 8}", encode, args.repeat, baseline)
+        measure(
+            f"columnar float{width * 8} + gzip",
+            lambda: gzip.compress(encode(), level),
+            args.repeat,
+            baseline,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
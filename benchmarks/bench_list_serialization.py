@@ -0,0 +1,120 @@
+"""
+Per-row cost of serializing the list endpoints, on a temporary SQLite
+database: one history page of a sensor and the sensor list.
+
+"schemas" is the previous path: a SensorDataReadSchema per row (get_all:
+ORM objects, __dict__ copy and model_validate per sensor), then the
+response_model validation and dump_json FastAPI does. "fast path" turns the
+row tuples into the body with codec.dumps_rows, under every available JSON
+backend. "rows only" is the query itself, left out of the per-row figures.
+
+    python benchmarks/bench_list_serialization.py --points 5000 --sensors 200
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import common  # noqa: F401  (environment bootstrap)
+
+from pydantic import TypeAdapter
+
+from crud.sensors import SensorDataCRUD
+from db.database import init_db, session_factory
+from db.partitions import partition_router
+from schemas.sensors import SensorHistoryPoint, SensorMessage, SensorReadSchema
+from services.batch_saver import save_batch_to_db
+from utils import codec
+from utils.helpers import to_epoch_ms
+
+HISTORY = TypeAdapter(List[SensorHistoryPoint])
+SENSORS = TypeAdapter(List[SensorReadSchema])
+
+
+async def seed(args) -> None:
+    await init_db()
+    now = datetime.now().replace(microsecond=0)
+    async with session_factory() as session:
+        await save_batch_to_db(
+            session,
+            [
+                SensorMessage(
+                    device_id=f"DS18B20_{sensor:012x}",
+                    timestamp=now.isoformat(),
+                    data={"value": sensor, "unit": "celsius"},
+                    value=sensor,
+                    unit="celsius",
+                    online=True,
+                )
+                for sensor in range(args.sensors)
+            ],
+        )
+        rows = [
+            {
+                "sensor_id": 1,
+                "ts": to_epoch_ms(now - timedelta(seconds=10 * i)),
+                "value": 20 + i % 100 / 10,
+            }
+            for i in range(1, args.points)
+        ]
+        await partition_router.insert(session, rows)
+        await session.commit()
+
+
+async def measure(label: str, run, repeat: int, count: int, base: float = 0) -> float:
+    await run()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await run()
+    elapsed = (time.perf_counter() - started) / repeat
+    per_row = f" {(elapsed - base) / count * 1e6:7.2f} us/row" if base else ""
+    print(f"  {label:<26} {elapsed * 1000:8.2f} ms{per_row}")
+    return elapsed
+
+
+async def main(args):
+    await seed(args)
+    device_id = "DS18B20_000000000000"
+    async with session_factory() as session:
+
+        async def history_rows():
+            return await SensorDataCRUD.get_history_rows(session, device_id)
+
+        async def history_schemas():
+            page = await SensorDataCRUD.get_history_page(session, device_id)
+            return HISTORY.dump_json(HISTORY.validate_python(page.items))
+
+        async def history_fast():
+            return SensorDataCRUD.history_json(device_id, await history_rows())
+
+        async def sensors_schemas():
+            sensors = await SensorDataCRUD.get_all(session)
+            return SENSORS.dump_json(SENSORS.validate_python(sensors))
+
+        async def sensors_fast():
+            return await SensorDataCRUD.get_all_json(session)
+
+        print(f"history page, {args.points:,} points")
+        base = await measure("rows only", history_rows, args.repeat, args.points)
+        await measure("schemas", history_schemas, args.repeat, args.points, base)
+        for name in codec.BACKENDS:
+            codec.set_backend(name)
+            await measure(
+                f"fast path ({name})", history_fast, args.repeat, args.points, base
+            )
+
+        print(f"sensor list, {args.sensors:,} sensors")
+        await measure("schemas", sensors_schemas, args.repeat, args.sensors)
+        for name in codec.BACKENDS:
+            codec.set_backend(name)
+            await measure(f"fast path ({name})", sensors_fast, args.repeat, args.sensors)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--sensors", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
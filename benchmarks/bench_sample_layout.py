@@ -0,0 +1,185 @@
+"""
+Size and scan cost of the history layouts on SQLite: the previous wide
+sensors_data table (string device_id, ISO datetime, JSON text, unit and a
+(device_id, timestamp) index) against the narrow sensor_samples day
+partitions (integer sensor id, epoch-ms ts, REAL value, WITHOUT ROWID).
+
+Both databases hold the same readings. Reported: file size after VACUUM
+(with the -wal and -shm files), bytes per reading, a one-sensor window
+read and a one-day aggregate over all sensors.
+
+    python benchmarks/bench_sample_layout.py --sensors 20 --days 3 --interval 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import common  # noqa: F401  (environment bootstrap)
+
+from sqlalchemy import text
+
+from core.settings import settings
+from db.database import engine, init_db, session_factory
+from db.partitions import PARENT, partition_router
+from utils import codec
+from utils.helpers import to_epoch_ms
+
+LEGACY_DDL = """
+CREATE TABLE sensors_data (
+    id INTEGER NOT NULL PRIMARY KEY,
+    device_id VARCHAR NOT NULL,
+    timestamp DATETIME NOT NULL,
+    data TEXT NOT NULL,
+    value FLOAT,
+    unit VARCHAR
+);
+CREATE INDEX idx_sensor_device_timestamp ON sensors_data (device_id, timestamp);
+"""
+
+
+def readings(args):
+    start = datetime.combine(datetime.now().date(), datetime.min.time()) - timedelta(
+        days=args.days - 1
+    )
+    steps = args.days * 86400 // args.interval
+    for sensor in range(args.sensors):
+        for step in range(steps):
+            value = round(random.uniform(0, 100), 2)
+            yield (
+                sensor + 1,
+                f"DS18B20_{sensor:012x}",
+                start + timedelta(seconds=step * args.interval, milliseconds=sensor),
+                value,
+            )
+
+
+def build_legacy(path: str, args) -> None:
+    connection = sqlite3.connect(path)
+    connection.executescript(LEGACY_DDL)
+    connection.executemany(
+        "INSERT INTO sensors_data (device_id, timestamp, data, value, unit) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (
+            (
+                device_id,
+                moment.isoformat(" "),
+                codec.dumps_str({"value": value, "unit": "celsius"}),
+                value,
+                "celsius",
+            )
+            for _, device_id, moment, value in readings(args)
+        ),
+    )
+    connection.commit()
+    connection.execute("VACUUM")
+    connection.close()
+
+
+async def build_samples(args) -> None:
+    await init_db()
+    async with session_factory() as session:
+        rows = []
+        for sensor_id, _, moment, value in readings(args):
+            rows.append(
+                {"sensor_id": sensor_id, "ts": to_epoch_ms(moment), "value": value}
+            )
+            if len(rows) == 50000:
+                await partition_router.insert(session, rows)
+                rows.clear()
+        await partition_router.insert(session, rows)
+        await session.commit()
+        # The WAL profile leaves the rows in the -wal file until a checkpoint
+        await session.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    await engine.dispose()
+
+
+def measure(label: str, path: str, queries, count: int, repeat: int) -> None:
+    connection = sqlite3.connect(path)
+    # Whatever is left in the -wal and -shm files belongs to the database too
+    size = sum(
+        os.path.getsize(name)
+        for name in (path, f"{path}-wal", f"{path}-shm")
+        if os.path.exists(name)
+    )
+    print(f"{label:<16} {size / 2**20:8.1f} MiB {size / count:6.1f} B/reading")
+    for name, query, params in queries:
+        connection.execute(query, params).fetchall()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            rows = connection.execute(query, params).fetchall()
+        elapsed = (time.perf_counter() - started) / repeat
+        print(f"  {name:<30} {elapsed * 1000:8.2f} ms ({len(rows)} rows)")
+    connection.close()
+
+
+def main(args):
+    count = args.sensors * args.days * 86400 // args.interval
+    legacy = os.path.join(tempfile.mkdtemp(prefix="gm-bench-"), "legacy.db")
+    build_legacy(legacy, args)
+    asyncio.run(build_samples(args))
+    connection = sqlite3.connect(settings.database.patch)
+    connection.execute("VACUUM")
+    connection.close()
+
+    day_end = datetime.combine(datetime.now().date(), datetime.min.time()) + timedelta(
+        days=1
+    )
+    window = (day_end - timedelta(hours=6), day_end)
+    day = (day_end - timedelta(days=1), day_end)
+    device_id = f"DS18B20_{args.sensors // 2:012x}"
+    print(f"{count:,} readings, {args.sensors} sensors, {args.days} days")
+    measure(
+        "sensors_data",
+        legacy,
+        [
+            (
+                "6 h window of one sensor",
+                "SELECT timestamp, value FROM sensors_data WHERE device_id = ? "
+                "AND timestamp >= ? AND timestamp < ? ORDER BY timestamp DESC",
+                (device_id, *(moment.isoformat(" ") for moment in window)),
+            ),
+            (
+                "1 day avg of all sensors",
+                "SELECT device_id, avg(value) FROM sensors_data "
+                "WHERE timestamp >= ? AND timestamp < ? GROUP BY device_id",
+                tuple(moment.isoformat(" ") for moment in day),
+            ),
+        ],
+        count,
+        args.repeat,
+    )
+    measure(
+        "sensor_samples",
+        settings.database.patch,
+        [
+            (
+                "6 h window of one sensor",
+                f"SELECT ts, value FROM {PARENT} WHERE sensor_id = ? "
+                "AND ts >= ? AND ts < ? ORDER BY ts DESC",
+                (args.sensors // 2 + 1, *(to_epoch_ms(moment) for moment in window)),
+            ),
+            (
+                "1 day avg of all sensors",
+                f"SELECT sensor_id, avg(value) FROM {PARENT} "
+                "WHERE ts >= ? AND ts < ? GROUP BY sensor_id",
+                tuple(to_epoch_ms(moment) for moment in day),
+            ),
+        ],
+        count,
+        args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sensors", type=int, default=20)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--interval", type=int, default=10, help="seconds per reading")
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
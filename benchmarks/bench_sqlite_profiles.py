@@ -0,0 +1,128 @@
+"""
+Mixed load on SQLite for every settings.database.profile: concurrent batch
+writers (collectors) and API readers (sensor list and history) share one
+database file. Reports ingest throughput and read latency per profile.
+
+Every profile runs in its own process with its own database file, because
+the engine and its PRAGMAs are configured at import time.
+
+    python benchmarks/bench_sqlite_profiles.py --writers 3 --readers 4 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROFILES = ("default", "performance")
+
+
+def run_profiles(args):
+    for profile in PROFILES:
+        env = dict(
+            os.environ,
+            GM__DATABASE__PROFILE=profile,
+            GM__DATABASE__PATCH=os.path.join(
+                tempfile.mkdtemp(prefix="gm-bench-"), "bench.db"
+            ),
+        )
+        subprocess.run(
+            [sys.executable, __file__, "--worker", *sys.argv[1:]], env=env, check=True
+        )
+
+
+def make_batch(sensors: int, size: int, start: datetime, offset: int):
+    from schemas.sensors import SensorMessage
+
+    batch = []
+    for i in range(size):
+        value = round(random.uniform(0, 100), 2)
+        batch.append(
+            SensorMessage(
+                device_id=f"BENCH_{random.randrange(sensors)}",
+                timestamp=(start + timedelta(milliseconds=offset + i)).isoformat(),
+                data={"value": value, "unit": "celsius"},
+                value=value,
+                unit="celsius",
+                online=True,
+            )
+        )
+    return batch
+
+
+async def worker(args):
+    import common  # noqa: F401  (environment bootstrap)
+    from crud.sensors import SensorDataCRUD
+    from db.database import async_session_context, init_db
+    from core.settings import settings
+    from services.batch_saver import save_batch_to_db
+
+    await init_db()
+    start = datetime.now() - timedelta(days=1)
+    async with async_session_context() as session:
+        for b in range(args.history // args.batch_size):
+            await save_batch_to_db(
+                session, make_batch(args.sensors, args.batch_size, start, b * 1000)
+            )
+
+    deadline = time.perf_counter() + args.duration
+    inserted = 0
+    latencies = []
+
+    async def write(n: int):
+        nonlocal inserted
+        offset = 10**9 * (n + 1)
+        async with async_session_context() as session:
+            while time.perf_counter() < deadline:
+                batch = make_batch(args.sensors, args.batch_size, start, offset)
+                offset += args.batch_size
+                inserted += await save_batch_to_db(session, batch)
+                await asyncio.sleep(0)
+
+    async def read():
+        while time.perf_counter() < deadline:
+            async with async_session_context() as session:
+                started = time.perf_counter()
+                if random.random() < 0.5:
+                    await SensorDataCRUD.get_all(session)
+                else:
+                    await SensorDataCRUD.get_history(
+                        session, f"BENCH_{random.randrange(args.sensors)}"
+                    )
+                latencies.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(args.read_interval)
+
+    await asyncio.gather(
+        *(write(n) for n in range(args.writers)), *(read() for _ in range(args.readers))
+    )
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    print(
+        f"{settings.database.profile:<12} ingest {inserted / args.duration:9,.0f} rows/s | "
+        f"reads {len(latencies):6} p50 {statistics.median(latencies or [0]):7.2f} ms "
+        f"p95 {p95:7.2f} ms max {max(latencies or [0]):8.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sensors", type=int, default=50)
+    parser.add_argument("--history", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--writers", type=int, default=3)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--read-interval", type=float, default=0.05)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        asyncio.run(worker(args))
+    else:
+        run_profiles(args)
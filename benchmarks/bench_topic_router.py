@@ -0,0 +1,66 @@
+"""
+MQTT dispatch cost: linear fnmatch scan over all subscriptions (the previous
+AsyncMQTTClient._topic_matches loop) against the subscription trie.
+
+    python benchmarks/bench_topic_router.py --subscriptions 500 --messages 20000
+"""
+
+import argparse
+import fnmatch
+import random
+
+import common
+from services.topic_trie import TopicTrie
+
+
+def legacy_topic_matches(pattern: str, topic: str) -> bool:
+    pattern = pattern.replace("#", "**").replace("+", "*")
+    if pattern.endswith("**"):
+        return topic.startswith(pattern[:-2])
+    return fnmatch.fnmatch(topic, pattern)
+
+
+def make_subscriptions(count: int):
+    patterns = ["devices/#", "gm/+/online"]
+    for i in range(count - len(patterns)):
+        kind = i % 3
+        if kind == 0:
+            patterns.append(f"devices/dev{i}/data")
+        elif kind == 1:
+            patterns.append(f"devices/dev{i}/+")
+        else:
+            patterns.append(f"site/{i % 10}/dev{i}/#")
+    return patterns
+
+
+def main(args):
+    patterns = make_subscriptions(args.subscriptions)
+    subscriptions = {pattern: pattern for pattern in patterns}
+    trie = TopicTrie()
+    for pattern in patterns:
+        trie.add(pattern, pattern)
+    topics = [
+        random.choice(
+            [
+                f"devices/dev{random.randrange(args.subscriptions)}/data",
+                f"devices/dev{random.randrange(args.subscriptions)}/online",
+                f"site/{random.randrange(10)}/dev{random.randrange(args.subscriptions)}/t",
+            ]
+        )
+        for _ in range(args.messages)
+    ]
+
+    print(f"{args.subscriptions} subscriptions, {args.messages} messages")
+    with common.timer("linear fnmatch scan", args.messages):
+        for topic in topics:
+            [cb for p, cb in subscriptions.items() if legacy_topic_matches(p, topic)]
+    with common.timer("topic trie", args.messages):
+        for topic in topics:
+            trie.match(topic)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subscriptions", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,38 @@
+"""
+Shared bootstrap for the benchmark scripts.
+
+Benchmarks are plain scripts (``python benchmarks/<name>.py``). They use the
+test environment from ``.env_test`` and a temporary SQLite database, so they
+never touch ``backend/db/base/database.db``.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+for line in (ROOT / ".env_test").read_text(encoding="utf-8").splitlines():
+    line = line.strip()
+    if line and not line.startswith("#") and "=" in line:
+        key, value = line.split("=", 1)
+        os.environ.setdefault(key, value)
+os.environ["GM__LOG__LEVEL"] = os.environ.get("GM__BENCH__LOG_LEVEL", "WARNING")
+os.environ.setdefault(
+    "GM__DATABASE__PATCH", os.path.join(tempfile.mkdtemp(prefix="gm-bench-"), "bench.db")
+)
+
+sys.path.insert(0, str(ROOT / "backend"))
+
+
+@contextmanager
+def timer(label: str, count: int = 0):
+    """Prints elapsed time (and rate, if count is given) of the wrapped block."""
+    started = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - started
+    rate = f", {count / elapsed:,.0f} ops/s" if count else ""
+    print(f"{label:<40} {elapsed * 1000:10.2f} ms{rate}")
@@ -1,5 +1,5 @@
 import {api} from "../boot/axios.ts";
-import type {SensorsType, UpdateSensorType} from "../../types/sensors.ts";
+import type {SensorHistoryPointType, SensorsType, UpdateSensorType} from "../../types/sensors.ts";
 
 const fetchDevicesAPI = async () => {
     const response = await api.get('sensors/get/all')
@@ -18,9 +18,29 @@ const readDeviceAPI = async (device_id: string): Promise<SensorsType> => {
 }
 
 
-const fetchSensorHistoryAPI = async (device_id: string) => {
-    const response = await api.get(`sensors/get/history/${device_id}`)
-    return response.data
+type HistoryWindowType = {
+    from?: Date
+    to?: Date
+    max_points?: number
+    cursor?: string
+}
+
+// One request per window: the server returns at most max_points points of
+// [from, to), read from rollups and downsampled when the raw samples do not
+// fit. nextCursor (older points) is followed only when the caller asks for it
+const fetchSensorHistoryAPI = async (
+    device_id: string,
+    window: HistoryWindowType = {}
+): Promise<{ points: SensorHistoryPointType[], nextCursor?: string }> => {
+    const response = await api.get(`sensors/get/history/${device_id}`, {
+        params: {
+            from: window.from?.toISOString(),
+            to: window.to?.toISOString(),
+            max_points: window.max_points,
+            cursor: window.cursor,
+        }
+    })
+    return {points: response.data, nextCursor: response.headers['x-next-cursor']}
 }
 
 export {updateDeviceAPI, fetchDevicesAPI, readDeviceAPI, fetchSensorHistoryAPI}
\ No newline at end of file
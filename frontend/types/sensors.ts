@@ -29,4 +29,15 @@ type SensorDataReadType = {
     online: boolean
 }
 
-export type {SensorsType, UpdateSensorType, SensorDataReadType}
\ No newline at end of file
+// Point of /sensors/get/history: min, max and count are sent only for rollup buckets
+type SensorHistoryPointType = {
+    device_id: string
+    timestamp: string
+    value: number | null
+    unit: string | null
+    min?: number
+    max?: number
+    count?: number
+}
+
+export type {SensorsType, UpdateSensorType, SensorDataReadType, SensorHistoryPointType}
\ No newline at end of file
@@ -0,0 +1,82 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+from backend.collectors import mqtt_collector
+from backend.collectors.mqtt_collector import MQTTCollector
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = {"saved": [], "published": [], "online": []}
+
+    @asynccontextmanager
+    async def session_factory():
+        yield None
+
+    async def save_batch_to_db(session, messages):
+        calls["saved"].append([message.device_id for message in messages])
+
+    async def publish_many_to_redis(client, messages):
+        calls["published"].append([message.device_id for message in messages])
+
+    async def set_online(device_ids, online, session):
+        calls["online"].append((sorted(device_ids), online))
+
+    monkeypatch.setattr(mqtt_collector, "session_factory", session_factory)
+    monkeypatch.setattr(mqtt_collector, "save_batch_to_db", save_batch_to_db)
+    monkeypatch.setattr(mqtt_collector, "publish_many_to_redis", publish_many_to_redis)
+    monkeypatch.setattr(mqtt_collector.SensorDataCRUD, "set_online", set_online)
+    return calls
+
+
+def reading(device_id: str):
+    return mqtt_collector.SensorMessage(
+        device_id=device_id,
+        timestamp="2024-01-01T00:00:00",
+        data={"value": 1, "unit": "celsius"},
+        value=1,
+        unit="celsius",
+        online=True,
+    )
+
+
+def online(device_id: str, state: bool):
+    return mqtt_collector.SensorOnlineMessage(device_id=device_id, online=state)
+
+
+async def test_online_message_is_queued_not_written(calls):
+    collector = MQTTCollector()
+    collector._device_index = {"esp1": {"T_esp1", "H_esp1"}}
+
+    await collector._on_message("devices/esp1/online", b"false", 0, None)
+
+    assert collector.queue_depth == 2
+    assert calls["online"] == []
+
+
+async def test_flush_applies_last_transition_per_device(calls):
+    await MQTTCollector()._flush(
+        [
+            online("A", False),
+            reading("A"),
+            reading("B"),
+            online("B", False),
+            online("C", False),
+            online("C", True),
+            online("D", False),
+            online("D", False),
+        ]
+    )
+
+    assert calls["saved"] == [["A", "B"]]
+    assert calls["published"] == [["A", "B"]]
+    # A is online through its reading, B went offline after it
+    assert calls["online"] == [(["C"], True), (["B", "D"], False)]
+
+
+async def test_flush_without_readings_only_updates_online(calls):
+    await MQTTCollector()._flush([online("A", False)])
+
+    assert calls["saved"] == [] and calls["published"] == []
+    assert calls["online"] == [(["A"], False)]
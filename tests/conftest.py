@@ -0,0 +1,15 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def berlin(monkeypatch):
+    """Runs the test with the process timezone set to Europe/Berlin."""
+    if not hasattr(time, "tzset"):
+        pytest.skip("time.tzset is not available")
+    monkeypatch.setenv("TZ", "Europe/Berlin")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
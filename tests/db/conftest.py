@@ -0,0 +1,55 @@
+import os
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from db.database import init_db
+from db.partitions import partition_router
+from models import SensorSample
+from services.batch_saver import last_value_cache
+
+# TEST_POSTGRES_URL points the tests at an existing server,
+# otherwise a throwaway container is started through testcontainers
+TEST_POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+
+@pytest.fixture(scope="session")
+def postgres_url():
+    pytest.importorskip("asyncpg")
+    if TEST_POSTGRES_URL:
+        yield TEST_POSTGRES_URL
+        return
+    postgres = pytest.importorskip("testcontainers.postgres")
+    try:
+        container = postgres.PostgresContainer("postgres:16-alpine", driver="asyncpg")
+        container.start()
+    except Exception as e:
+        pytest.skip(f"Docker is not available: {e}")
+    try:
+        yield container.get_connection_url()
+    finally:
+        container.stop()
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+async def engine(request, tmp_path):
+    """Empty database of every supported backend."""
+    if request.param == "sqlite":
+        pytest.importorskip("aiosqlite")
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    else:
+        engine = create_async_engine(request.getfixturevalue("postgres_url"))
+        async with engine.begin() as conn:
+            await conn.run_sync(SensorSample.metadata.drop_all)
+    partition_router.reset()
+    last_value_cache.clear()
+    yield engine
+    partition_router.reset()
+    last_value_cache.clear()
+    await engine.dispose()
+
+
+@pytest.fixture
+async def session_factory(engine):
+    await init_db(engine)
+    return async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
@@ -0,0 +1,475 @@
+import json
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from fastapi import HTTPException
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+
+import crud.sensors
+from crud.sensors import SensorDataCRUD
+from db import sensor_latest
+from db.partitions import day_bounds, partition_name, partition_router
+from db.rollups import RESOLUTIONS
+from models import Sensor, SensorLatest, SensorRollup, SensorSample, SensorSampleRaw
+from schemas.sensors import SensorHistoryPoint, SensorMessage, SensorReadSchema
+import services.retention
+from services.batch_saver import save_batch_to_db
+from services.retention import RetentionService
+from utils import codec
+from utils.helpers import to_epoch_ms
+
+# Every test runs on each backend of the engine fixture (tests/db/conftest.py)
+
+
+@pytest.fixture
+def session_context(session_factory, monkeypatch):
+    """Points the code that opens its own session at the test database."""
+
+    @asynccontextmanager
+    async def test_session():
+        async with session_factory() as session:
+            yield session
+
+    for module in (crud.sensors, services.retention):
+        monkeypatch.setattr(module, "async_session_context", test_session)
+
+
+def make_batch(device_ids, start: datetime, online: bool = True, base: int = 0):
+    return [
+        SensorMessage(
+            device_id=device_id,
+            timestamp=(start + timedelta(seconds=i)).isoformat(),
+            data={"value": base + i, "unit": "celsius"},
+            value=base + i,
+            unit="celsius",
+            online=online,
+        )
+        for i, device_id in enumerate(device_ids)
+    ]
+
+
+async def test_batch_is_saved_and_sensors_upserted(session_factory):
+    start = datetime.now() - timedelta(minutes=10)
+    async with session_factory() as session:
+        saved = await save_batch_to_db(session, make_batch(["T_1", "T_2", "T_1"], start))
+        assert saved == 3
+        saved = await save_batch_to_db(
+            session,
+            make_batch(["T_2", "T_3"], start + timedelta(minutes=1), online=False),
+        )
+        assert saved == 2
+
+        rows = await session.scalar(select(func.count()).select_from(SensorSample))
+        assert rows == 5
+        # {"value", "unit"} payloads are rebuilt from the sample, not stored
+        raw = await session.scalar(select(func.count()).select_from(SensorSampleRaw))
+        assert raw == 0
+        sensors = dict(
+            (await session.execute(select(Sensor.device_id, Sensor.online))).all()
+        )
+        assert sensors == {"T_1": True, "T_2": False, "T_3": False}
+
+
+async def test_crud_reads(session_factory):
+    start = datetime.now() - timedelta(minutes=10)
+    async with session_factory() as session:
+        await save_batch_to_db(session, make_batch(["T_1", "T_2", "T_1"], start))
+
+        sensors = await SensorDataCRUD.get_all(session)
+        assert {sensor.device_id for sensor in sensors} == {"T_1", "T_2"}
+        history = await SensorDataCRUD.get_history(session, "T_1")
+        assert [point.value for point in history] == [2, 0]
+        assert await SensorDataCRUD.get_value("T_2", session) == 1
+        sensor = await SensorDataCRUD.get("T_1", session)
+        assert sensor.details == {"value": 2, "unit": "celsius"}
+
+
+async def test_history_is_routed_to_day_partitions(session_factory):
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    async with session_factory() as session:
+        for days in (3, 2, 0):
+            await save_batch_to_db(
+                session,
+                make_batch(["T_1"], today - timedelta(days=days, hours=-1), base=days),
+            )
+        assert partition_router.days == [
+            (today - timedelta(days=days)).date() for days in (3, 2, 0)
+        ]
+
+        window = await SensorDataCRUD.get_history(
+            session, "T_1", start=today - timedelta(days=2), end=today
+        )
+        assert len(window) == 1
+
+        dropped = await partition_router.drop_before(
+            session, to_epoch_ms(today - timedelta(days=1))
+        )
+        await session.commit()
+        assert dropped == [
+            partition_name((today - timedelta(days=days)).date()) for days in (3, 2)
+        ]
+        assert len(await SensorDataCRUD.get_history(session, "T_1")) == 1
+
+        # A late reading creates a dropped day again
+        await save_batch_to_db(
+            session, make_batch(["T_1"], today - timedelta(days=3, hours=-2), base=9)
+        )
+        assert (today - timedelta(days=3)).date() in partition_router.days
+        assert len(await SensorDataCRUD.get_history(session, "T_1")) == 2
+
+
+async def test_rolled_back_partition_is_created_again(session_factory):
+    day = date(2024, 3, 1)
+    sample = {"sensor_id": 1, "ts": day_bounds(day)[0], "value": 1.0}
+    async with session_factory() as session:
+        session.add(Sensor(device_id="T_1", name="T_1"))
+        await session.flush()
+        await partition_router.insert(session, [sample])
+        await session.rollback()
+    assert day not in partition_router.days
+
+    async with session_factory() as session:
+        await partition_router.insert(session, [sample])
+        await session.commit()
+        assert partition_router.days == [day]
+        assert await session.scalar(select(func.count()).select_from(SensorSample)) == 1
+
+
+async def test_raw_payloads_and_conflicting_samples(session_factory):
+    start = datetime.now() - timedelta(minutes=10)
+    message = SensorMessage(
+        device_id="T_1",
+        timestamp=start.isoformat(),
+        data={"value": 1, "unit": "ppm", "tvoc": 7},
+        value=1,
+        unit="ppm",
+        online=True,
+    )
+    async with session_factory() as session:
+        assert await save_batch_to_db(session, [message]) == 1
+        # Same sensor and millisecond in a later batch replaces the stored
+        # sample instead of being lost (on PostgreSQL it is upserted, not copied)
+        replaced = message.model_copy(update={"data": {"value": 2, "unit": "ppm"}})
+        replaced.value = 2
+        assert await save_batch_to_db(session, [replaced]) == 1
+
+        values = (await session.execute(select(SensorSample.value))).scalars().all()
+        assert values == [2]
+        raw = await session.scalar(select(func.count()).select_from(SensorSampleRaw))
+        assert raw == 1
+        sensor = await SensorDataCRUD.get("T_1", session)
+        assert sensor.details == {"value": 2, "unit": "ppm"}
+
+
+async def test_latest_reading_is_kept_current(session_factory):
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    async with session_factory() as session:
+        await save_batch_to_db(
+            session, make_batch(["T_1", "T_2"], today - timedelta(days=2), base=1)
+        )
+        await save_batch_to_db(session, make_batch(["T_1"], today, base=5))
+        # A late reading older than the stored one leaves sensor_latest alone
+        await save_batch_to_db(
+            session, make_batch(["T_1"], today - timedelta(days=1), base=3)
+        )
+        assert await SensorDataCRUD.get_value("T_1", session) == 5
+
+        await partition_router.drop_before(session, to_epoch_ms(today))
+        await session.commit()
+        sensors = {
+            sensor.device_id: sensor for sensor in await SensorDataCRUD.get_all(session)
+        }
+        assert sensors["T_1"].timestamp == today
+        assert sensors["T_2"].timestamp == today - timedelta(days=2, seconds=-1)
+        assert (await SensorDataCRUD.get("T_2", session)).value == 2
+
+        await session.execute(SensorLatest.__table__.delete())
+        await session.commit()
+        async with session.bind.connect() as conn:
+            await sensor_latest.backfill(conn)
+            await conn.commit()
+        assert await session.scalar(select(func.count()).select_from(SensorLatest)) == 1
+        assert await SensorDataCRUD.get_value("T_1", session) == 5
+
+
+async def test_history_is_served_from_rollups(session_factory):
+    start = datetime.now().replace(microsecond=0) - timedelta(hours=3)
+    async with session_factory() as session:
+        for minute in range(0, 180, 30):
+            await save_batch_to_db(
+                session,
+                [
+                    SensorMessage(
+                        device_id="T_1",
+                        timestamp=(start + timedelta(minutes=minute + i)).isoformat(),
+                        data={"value": i, "unit": "celsius"},
+                        value=i,
+                        unit="celsius",
+                        online=True,
+                    )
+                    for i in range(30)
+                ],
+            )
+
+        assert (
+            len(await SensorDataCRUD.get_history(session, "T_1", max_points=500)) == 180
+        )
+        hours = await SensorDataCRUD.get_history(session, "T_1", max_points=10)
+        assert len(hours) in (3, 4)
+        assert sum(point.count for point in hours) == 180
+        assert min(point.min for point in hours) == 0
+        assert max(point.max for point in hours) == 29
+
+
+async def test_average_of_latest_readings_and_window(session_factory):
+    now = datetime.now().replace(microsecond=0)
+    async with session_factory() as session:
+        await save_batch_to_db(
+            session, make_batch(["T_1", "T_2"], now - timedelta(days=3), base=100)
+        )
+        await save_batch_to_db(session, make_batch(["T_1", "T_2", "T_3"], now, base=1))
+
+        assert await SensorDataCRUD.get_av_value("celsius", session) == 2
+        assert await SensorDataCRUD.get_av_value("ppm", session) is None
+        day = await SensorDataCRUD.get_av_value(
+            "celsius", session, window=timedelta(days=1)
+        )
+        assert day == 2
+        week = await SensorDataCRUD.get_av_value(
+            "celsius", session, window=timedelta(days=7)
+        )
+        assert week == (100 + 101 + 1 + 2 + 3) / 5
+
+
+async def test_history_batch_is_columnar(session_factory):
+    start = datetime.now().replace(microsecond=0) - timedelta(hours=3)
+    async with session_factory() as session:
+        for minute in range(0, 180, 30):
+            await save_batch_to_db(
+                session,
+                make_batch(
+                    ["T_1", "T_2"], start + timedelta(minutes=minute), base=minute
+                ),
+            )
+
+        series = await SensorDataCRUD.get_history_batch(
+            session, ["T_2", "NOPE", "T_1"], max_points=100
+        )
+        assert [item.device_id for item in series] == ["T_2", "T_1"]
+        assert series[0].unit == "celsius" and series[0].resolution is None
+        assert series[1].values == [minute for minute in range(0, 180, 30)]
+        assert series[1].timestamps == sorted(series[1].timestamps)
+
+        hourly = await SensorDataCRUD.get_history_batch(
+            session, ["T_1", "T_2"], max_points=1
+        )
+        assert {item.resolution for item in hourly} == {3600}
+        assert all(len(item.timestamps) == 1 for item in hourly)
+
+
+async def test_history_export_streams_in_chunks(session_factory, session_context):
+    start = datetime.now().replace(microsecond=0) - timedelta(minutes=10)
+    async with session_factory() as session:
+        await save_batch_to_db(session, make_batch(["T_1"] * 5, start))
+
+        chunks = await SensorDataCRUD.export_history(
+            session, "T_1", "ndjson", chunk_rows=2
+        )
+        chunks = [chunk async for chunk in chunks]
+        assert [chunk.count(b"\n") for chunk in chunks] == [2, 2, 1]
+        first = json.loads(chunks[0].splitlines()[0])
+        assert first == {
+            "device_id": "T_1",
+            "timestamp": start.astimezone().isoformat(),
+            "value": 0,
+            "unit": "celsius",
+        }
+
+        chunks = await SensorDataCRUD.export_history(
+            session, "T_1", "csv", start=start + timedelta(seconds=3)
+        )
+        lines = b"".join([chunk async for chunk in chunks]).decode().splitlines()
+        assert lines[0] == "device_id,timestamp,value,unit"
+        assert [line.split(",")[2] for line in lines[1:]] == ["3.0", "4.0"]
+
+        with pytest.raises(HTTPException) as error:
+            await SensorDataCRUD.export_history(session, "NOPE", "csv")
+        assert error.value.status_code == 404
+
+
+async def test_fast_path_json_matches_schemas(session_factory):
+    start = datetime.now() - timedelta(hours=3)
+    async with session_factory() as session:
+        for minute in range(0, 180, 30):
+            await save_batch_to_db(
+                session,
+                make_batch(
+                    ["T_1", "T_2"], start + timedelta(minutes=minute), base=minute
+                ),
+            )
+
+        sensors = TypeAdapter(List[SensorReadSchema]).dump_python(
+            await SensorDataCRUD.get_all(session), mode="json"
+        )
+        history = TypeAdapter(List[SensorHistoryPoint])
+        for name in codec.BACKENDS:
+            previous = codec.set_backend(name)
+            try:
+                assert json.loads(await SensorDataCRUD.get_all_json(session)) == sensors
+                # Raw samples carry no min, max and count, rollup buckets do
+                for max_points, extra in ((None, set()), (1, {"min", "max", "count"})):
+                    rows = await SensorDataCRUD.get_history_rows(
+                        session, "T_1", max_points=max_points
+                    )
+                    page = await SensorDataCRUD.get_history_page(
+                        session, "T_1", max_points=max_points
+                    )
+                    points = json.loads(SensorDataCRUD.history_json("T_1", rows))
+                    assert points == history.dump_python(page.items, mode="json")
+                    assert set(points[0]) == {
+                        "device_id",
+                        "timestamp",
+                        "value",
+                        "unit",
+                        *extra,
+                    }
+            finally:
+                codec.set_backend(previous.name)
+
+
+async def test_history_keyset_pages(session_factory):
+    start = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+    async with session_factory() as session:
+        await save_batch_to_db(
+            session,
+            [
+                SensorMessage(
+                    device_id="T_1",
+                    timestamp=(start + timedelta(seconds=i)).isoformat(),
+                    data={"value": i, "unit": "celsius"},
+                    value=i,
+                    unit="celsius",
+                    online=True,
+                )
+                for i in range(25)
+            ],
+        )
+
+        values, cursor, pages = [], None, 0
+        while True:
+            page = await SensorDataCRUD.get_history_page(
+                session, "T_1", limit=10, cursor=cursor
+            )
+            values += [point.value for point in page.items]
+            pages += 1
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        assert pages == 3
+        assert values == list(range(24, -1, -1))
+
+        window = await SensorDataCRUD.get_history_page(
+            session,
+            "T_1",
+            start=start + timedelta(seconds=5),
+            end=start + timedelta(seconds=8),
+            limit=10,
+        )
+        assert [point.value for point in window.items] == [7, 6, 5]
+        assert window.next_cursor is None
+
+
+def reading(moment: datetime, value: float) -> SensorMessage:
+    return SensorMessage(
+        device_id="T_1",
+        timestamp=moment.isoformat(),
+        data={"value": value, "unit": "celsius"},
+        value=value,
+        unit="celsius",
+        online=True,
+    )
+
+
+async def test_rollups_count_replaced_samples_once(session_factory):
+    minute = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+    second = timedelta(seconds=1)
+    async with session_factory() as session:
+        await save_batch_to_db(
+            session, [reading(minute, 10), reading(minute + second, 20)]
+        )
+        # A redelivered sample, a replaced one and a duplicate within the batch
+        await save_batch_to_db(
+            session,
+            [
+                reading(minute, 10),
+                reading(minute + second, 5),
+                reading(minute + 2 * second, 1),
+                reading(minute + 2 * second, 3),
+            ],
+        )
+
+        samples = (await session.execute(select(SensorSample.value))).scalars().all()
+        assert sorted(samples) == [3, 5, 10]
+        rollups = (
+            await session.execute(
+                select(
+                    SensorRollup.resolution,
+                    SensorRollup.count,
+                    SensorRollup.total,
+                    SensorRollup.min,
+                    SensorRollup.max,
+                    SensorRollup.last_value,
+                ).order_by(SensorRollup.resolution)
+            )
+        ).all()
+        assert rollups == [(resolution, 3, 18, 3, 10, 3) for resolution in RESOLUTIONS]
+
+
+async def test_retention_drops_partitions_and_expired_rows(
+    session_factory, session_context
+):
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    async with session_factory() as session:
+        for days in (5, 2, 0):
+            await save_batch_to_db(
+                session, make_batch(["T_1", "T_2"], now - timedelta(days=days), base=days)
+            )
+
+    retention = RetentionService(keep_data=3, devices={"T_2": 1}, units={}, chunk_size=1)
+    # The expired T_2 sample and the rollups of every expired sample
+    assert await retention.run_once() == 1 + 3 * len(RESOLUTIONS)
+
+    async with session_factory() as session:
+        # The oldest day is dropped as a whole, T_2 keeps one day only
+        assert (now - timedelta(days=5)).date() not in partition_router.days
+        for device_id, values in (("T_1", [0, 2]), ("T_2", [1])):
+            history = await SensorDataCRUD.get_history(session, device_id)
+            assert [point.value for point in history] == values
+        rollups = await session.scalar(select(func.count()).select_from(SensorRollup))
+        assert rollups == 3 * len(RESOLUTIONS)
+
+
+async def test_rollup_buckets_expire_once_they_end(session_factory):
+    start = datetime.now(timezone.utc).replace(
+        hour=10, minute=10, second=0, microsecond=0
+    ) - timedelta(days=1)
+    async with session_factory() as session:
+        await save_batch_to_db(
+            session, [reading(start, 1), reading(start + timedelta(minutes=20), 3)]
+        )
+        cutoff = to_epoch_ms(start + timedelta(minutes=5))
+        for table in (partition_router.tables(session)[0], SensorRollup.__table__):
+            await SensorDataCRUD.delete_expired(session, table, cutoff, 100)
+
+        # Only the minute of the expired sample is over, its hour and day are not
+        rollups = (
+            await session.execute(
+                select(SensorRollup.resolution, SensorRollup.count).order_by(
+                    SensorRollup.resolution
+                )
+            )
+        ).all()
+        assert rollups == [(60, 1), (3600, 2), (86400, 2)]
@@ -0,0 +1,57 @@
+import pytest
+
+from db import rollups
+
+MINUTE = 60_000
+HOUR = 60 * MINUTE
+
+
+def test_aggregate_merges_samples_per_bucket():
+    samples = [
+        {"sensor_id": 1, "ts": HOUR + 5_000, "value": 4},
+        {"sensor_id": 1, "ts": HOUR + 1_000, "value": 10},
+        {"sensor_id": 1, "ts": HOUR + MINUTE, "value": 1},
+        {"sensor_id": 2, "ts": HOUR, "value": None},
+    ]
+    buckets = {(row["resolution"], row["ts"]): row for row in rollups.aggregate(samples)}
+
+    assert len(buckets) == 4  # two minutes, one hour, one day of sensor 1
+    minute = buckets[(60, HOUR)]
+    assert (minute["count"], minute["total"], minute["min"], minute["max"]) == (
+        2,
+        14.0,
+        4.0,
+        10.0,
+    )
+    assert (minute["last_ts"], minute["last_value"]) == (HOUR + 5_000, 4.0)
+    hour = buckets[(3600, HOUR)]
+    assert (hour["count"], hour["last_value"]) == (3, 1.0)
+    assert buckets[(86400, 0)]["count"] == 3
+
+
+def test_bucket_of():
+    assert rollups.bucket_of(HOUR + 59_999, 60) == HOUR
+    assert rollups.bucket_of(HOUR + MINUTE, 60) == HOUR + MINUTE
+    assert rollups.bucket_of(HOUR - 1, 3600) == 0
+
+
+@pytest.mark.parametrize(
+    "span, samples, max_points, expected",
+    [
+        (24 * HOUR, 500, 1000, None),
+        (24 * HOUR, 86_400, 2000, 60),
+        (24 * HOUR, 86_400, 1000, 3600),
+        (30 * 24 * HOUR, 2_592_000, 100, 86400),
+        (365 * 24 * HOUR, 31_536_000, 10, rollups.RESOLUTIONS[-1]),
+    ],
+)
+def test_pick_resolution(span, samples, max_points, expected):
+    assert rollups.pick_resolution(span, samples, max_points) == expected
+
+
+@pytest.mark.parametrize(
+    "window, expected",
+    [(600, 60), (3600, 60), (86400, 3600), (7 * 86400, 3600), (30 * 86400, 86400)],
+)
+def test_window_resolution(window, expected):
+    assert rollups.window_resolution(window) == expected
@@ -0,0 +1,129 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, func, select, text
+
+from crud.sensors import SensorDataCRUD
+from db.database import init_db
+from db.partitions import VIEW_TERMS, day_bounds, partition_name, partition_router
+from models import Sensor, SensorSample, SensorSampleRaw
+from schemas.sensors import SensorMessage
+from services.batch_saver import save_batch_to_db
+from utils.helpers import to_epoch_ms
+
+# Dialect-specific tests, the shared ones run on every backend in test_history
+pytestmark = pytest.mark.parametrize("engine", ["sqlite"], indirect=True)
+
+
+async def count_samples(session) -> int:
+    return await session.scalar(select(func.count()).select_from(SensorSample))
+
+
+async def count_views(session) -> int:
+    return await session.scalar(
+        text("SELECT count(*) FROM sqlite_master WHERE type = 'view'")
+    )
+
+
+async def test_view_spans_more_partitions_than_a_compound_select(session_factory):
+    first = date(2020, 1, 1)
+    days = [first + timedelta(days=i) for i in range(VIEW_TERMS + 1)]
+    async with session_factory() as session:
+        await partition_router.insert(
+            session,
+            [{"sensor_id": 1, "ts": day_bounds(day)[0], "value": 1.0} for day in days],
+        )
+        await session.commit()
+        assert len(partition_router.days) == len(days)
+        assert await count_samples(session) == len(days)
+        # sensor_samples over two views of up to VIEW_TERMS partitions
+        assert await count_views(session) == 3
+
+        dropped = await partition_router.drop_before(session, day_bounds(days[2])[0])
+        await session.commit()
+        assert dropped == [partition_name(day) for day in days[:2]]
+        assert partition_router.days == days[2:]
+        assert await count_samples(session) == len(days) - 2
+        assert await count_views(session) == 1
+
+
+async def test_legacy_history_is_migrated_to_utc_partitions(engine, berlin):
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "CREATE TABLE sensors (id INTEGER PRIMARY KEY, device_id VARCHAR UNIQUE,"
+                " name VARCHAR, description TEXT, online BOOLEAN,"
+                " created_at DATETIME, updated_at DATETIME)"
+            )
+        )
+        await conn.execute(
+            text(
+                "CREATE TABLE sensors_data (id INTEGER PRIMARY KEY, device_id VARCHAR,"
+                " timestamp DATETIME, data TEXT, value FLOAT, unit VARCHAR)"
+            )
+        )
+        await conn.execute(
+            text(
+                "INSERT INTO sensors VALUES (1, 'T_1', 'T_1', NULL, 1,"
+                " '2024-06-01 00:00:00.000000', '2024-06-01 00:00:00.000000')"
+            )
+        )
+        # Local Berlin times (UTC+2) on both sides of midnight UTC
+        await conn.execute(
+            text(
+                "INSERT INTO sensors_data (device_id, timestamp, data, value, unit) "
+                "VALUES ('T_1', '2024-06-02 01:30:00.000000',"
+                ' \'{"value": 1, "unit": "celsius"}\', 1, \'celsius\'),'
+                " ('T_1', '2024-06-02 02:30:00.500000',"
+                ' \'{"value": 2, "unit": "celsius", "raw": 7}\', 2, \'celsius\')'
+            )
+        )
+
+    await init_db(engine)
+
+    async with engine.connect() as conn:
+        samples = (await conn.execute(select(SensorSample.ts, SensorSample.value))).all()
+        raw = (await conn.execute(select(SensorSampleRaw.ts))).scalars().all()
+        unit = await conn.scalar(select(Sensor.unit))
+        legacy = await conn.scalar(
+            text("SELECT count(*) FROM sqlite_master WHERE name = 'sensors_data'")
+        )
+    first = to_epoch_ms(datetime(2024, 6, 1, 23, 30, tzinfo=timezone.utc))
+    assert sorted(samples) == [(first, 1.0), (first + 3_600_500, 2.0)]
+    assert partition_router.days == [date(2024, 6, 1), date(2024, 6, 2)]
+    assert raw == [first + 3_600_500]
+    assert unit == "celsius"
+    assert legacy == 0
+
+
+async def test_history_batch_reads_only_the_window_partitions(engine, session_factory):
+    today = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+    async with session_factory() as session:
+        for days in (2, 1, 0):
+            await save_batch_to_db(
+                session,
+                [
+                    SensorMessage(
+                        device_id="T_1",
+                        timestamp=(today - timedelta(days=days)).isoformat(),
+                        data={"value": days, "unit": "celsius"},
+                        value=days,
+                        unit="celsius",
+                        online=True,
+                    )
+                ],
+            )
+
+        statements = []
+        event.listen(
+            engine.sync_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        series = await SensorDataCRUD.get_history_batch(
+            session, ["T_1"], max_points=100, start=today - timedelta(hours=30)
+        )
+        assert series[0].values == [1, 0]
+        sources = " ".join(statements)
+        assert "FROM sensor_samples " not in sources
+        assert partition_name((today - timedelta(days=2)).date()) not in sources
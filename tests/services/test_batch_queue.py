@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from backend.schemas.sensors import SensorOnlineMessage
+from backend.services.batch_queue import BatchQueue
+
+
+def message(i: int) -> SensorOnlineMessage:
+    return SensorOnlineMessage(device_id=f"T_{i}", online=True)
+
+
+async def stop(queue: BatchQueue, writer: asyncio.Task) -> None:
+    """Shutdown as the collectors do it: cancel the writer, then drain."""
+    writer.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await writer
+    await queue.drain()
+
+
+async def test_cancelled_writer_flushes_the_batch_it_collects():
+    saved = []
+
+    async def handler(batch):
+        saved.extend(item.device_id for item in batch)
+
+    queue = BatchQueue(handler, batch_size=10, flush_interval=60)
+    writer = asyncio.create_task(queue.run())
+    for i in range(3):
+        await queue.put(message(i))
+    # Let the writer take the messages off the queue and wait for more
+    while queue.depth:
+        await asyncio.sleep(0)
+    await queue.put(message(3))
+
+    await stop(queue, writer)
+    assert sorted(saved) == ["T_0", "T_1", "T_2", "T_3"]
+    assert queue.flushed == 4
+
+
+async def test_cancelled_flush_is_repeated():
+    saved, started = [], asyncio.Event()
+
+    async def handler(batch):
+        if not started.is_set():
+            started.set()
+            await asyncio.sleep(60)
+        saved.extend(item.device_id for item in batch)
+
+    queue = BatchQueue(handler, batch_size=2, flush_interval=60)
+    writer = asyncio.create_task(queue.run())
+    for i in range(3):
+        await queue.put(message(i))
+    await started.wait()
+
+    await stop(queue, writer)
+    assert sorted(saved) == ["T_0", "T_1", "T_2"]
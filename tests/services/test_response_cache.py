@@ -0,0 +1,60 @@
+from typing import List
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from backend.services.response_cache import ResponseCache
+
+
+@pytest.fixture
+def app():
+    cache = ResponseCache()
+    app = FastAPI()
+    app.state.cache, app.state.loads = cache, []
+
+    @app.get("/items")
+    async def items(request: Request):
+        async def load():
+            app.state.loads.append(cache.version("items"))
+            return [len(app.state.loads)]
+
+        return await cache.respond(request, "items", List[int], load)
+
+    return app
+
+
+def test_unchanged_resource_is_served_from_cache(app):
+    client = TestClient(app)
+    first = client.get("/items")
+    assert first.status_code == 200
+    assert first.json() == [1]
+    assert first.headers["cache-control"] == "no-cache"
+
+    second = client.get("/items")
+    assert second.json() == [1]
+    assert second.headers["etag"] == first.headers["etag"]
+    assert app.state.loads == [0]
+
+
+def test_if_none_match_returns_not_modified(app):
+    client = TestClient(app)
+    etag = client.get("/items").headers["etag"]
+    for header in (etag, f'"other", W/{etag}', "*"):
+        response = client.get("/items", headers={"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.content == b""
+    assert client.get("/items", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert app.state.loads == [0]
+
+
+def test_bump_invalidates_body_and_etag(app):
+    client = TestClient(app)
+    etag = client.get("/items").headers["etag"]
+    app.state.cache.bump("items")
+
+    response = client.get("/items", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == [2]
+    assert response.headers["etag"] != etag
+    assert app.state.loads == [0, 1]
@@ -0,0 +1,53 @@
+import pytest
+
+from backend.services.topic_trie import TopicTrie, topic_matches
+
+
+@pytest.mark.parametrize(
+    "pattern, topic, expected",
+    [
+        ("devices/#", "devices/esp1/data", True),
+        ("devices/#", "devices", True),
+        ("devices/+/data", "devices/esp1/data", True),
+        ("devices/+/data", "devices/esp1/sub/data", False),
+        ("devices/+", "devices/esp1/data", False),
+        ("+/+", "devices/esp1", True),
+        ("#", "$SYS/broker/uptime", False),
+        ("+/broker/uptime", "$SYS/broker/uptime", False),
+        ("$SYS/#", "$SYS/broker/uptime", True),
+        ("devices/esp1", "devices/esp1/data", False),
+    ],
+)
+def test_topic_matches(pattern, topic, expected):
+    assert topic_matches(pattern, topic) is expected
+    trie = TopicTrie()
+    trie.add(pattern, pattern)
+    assert (trie.match(topic) == [pattern]) is expected
+
+
+def test_match_returns_all_callbacks():
+    trie = TopicTrie()
+    for pattern in ("devices/#", "devices/+/online", "devices/esp1/online", "gm/#"):
+        trie.add(pattern, pattern)
+    assert sorted(trie.match("devices/esp1/online")) == [
+        "devices/#",
+        "devices/+/online",
+        "devices/esp1/online",
+    ]
+
+
+def test_remove_prunes_subscription():
+    trie = TopicTrie()
+    trie.add("devices/+/data", 1)
+    trie.add("devices/#", 2)
+    assert trie.remove("devices/+/data")
+    assert not trie.remove("devices/+/data")
+    assert trie.match("devices/esp1/data") == [2]
+    assert len(trie) == 1
+    assert "devices/+/data" not in trie
+
+
+@pytest.mark.parametrize("pattern", ["devices/#/data", "devices/esp+", "dev#", ""])
+def test_invalid_filter(pattern):
+    with pytest.raises(ValueError):
+        TopicTrie().add(pattern, None)
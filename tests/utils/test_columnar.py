@@ -0,0 +1,51 @@
+import struct
+
+import pytest
+
+from backend.utils import columnar
+
+
+def test_encode_round_trips_aligned_columns():
+    series = [
+        (
+            "DS18B20_a1",
+            "celsius",
+            None,
+            [1_700_000_000_000, 1_700_000_010_000],
+            [21.5, None],
+        ),
+        ("Влажность", None, 3600, [1_700_000_000_000], [55.25]),
+        ("empty", "ppm", 60, [], []),
+    ]
+    body = columnar.encode(series)
+    assert body[:4] == columnar.MAGIC
+    assert len(body) % 8 == 0
+    assert columnar.decode(body) == series
+
+    # The first timestamp column starts on an 8-byte boundary
+    offset = 12 + 2 + len(b"DS18B20_a1") + 2 + len(b"celsius") + 8
+    offset += -offset % 8
+    assert struct.unpack_from("<q", body, offset)[0] == 1_700_000_000_000
+
+
+def test_float32_values():
+    body = columnar.encode([("T_1", None, None, [1, 2], [0.1, None])], width=4)
+    ((_, _, _, timestamps, values),) = columnar.decode(body)
+    assert timestamps == [1, 2]
+    assert values[0] == pytest.approx(0.1, rel=1e-6) and values[1] is None
+    assert len(body) < len(columnar.encode([("T_1", None, None, [1, 2], [0.1, None])]))
+
+
+@pytest.mark.parametrize(
+    "accept, width",
+    [
+        (None, None),
+        ("application/json", None),
+        ("*/*", None),
+        ("application/vnd.gm.columnar", 8),
+        ("application/json;q=0.5, application/vnd.gm.columnar; precision=32", 4),
+        ("application/vnd.gm.columnar;q=0", None),
+    ],
+)
+def test_negotiate(accept, width):
+    assert columnar.negotiate(accept) == width
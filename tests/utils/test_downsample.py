@@ -0,0 +1,38 @@
+import math
+from array import array
+
+import pytest
+
+from backend.utils import downsample
+
+
+def wave(size: int):
+    x = [float(i * 1000) for i in range(size)]
+    y = [math.sin(i / 50) for i in range(size)]
+    y[size // 3] = 25.0  # a spike that downsampling must keep
+    return x, y
+
+
+@pytest.mark.parametrize("threshold", [3, 10, 100, 999])
+def test_lttb_keeps_edges_and_peaks(threshold):
+    x, y = wave(1000)
+    kept = downsample._lttb_python(array("d", x), array("d", y), threshold)
+
+    assert len(kept) == threshold
+    assert kept == sorted(set(kept))
+    assert kept[0] == 0 and kept[-1] == 999
+    if threshold >= 10:
+        assert 1000 // 3 in kept
+
+
+def test_lttb_small_inputs():
+    assert downsample.lttb([1, 2, 3], [1, 2, 3], 5) == [0, 1, 2]
+    assert downsample.lttb([1, 2, 3], [1, 2, 3], 2) == [0, 2]
+    assert downsample.lttb([1, 2, 3], [1, 2, 3], 1) == [0]
+
+
+def test_lttb_numpy_matches_python():
+    numpy = pytest.importorskip("numpy")
+    x, y = wave(5000)
+    expected = downsample._lttb_python(array("d", x), array("d", y), 300)
+    assert downsample._lttb_numpy(numpy.asarray(x), numpy.asarray(y), 300) == expected
@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta, timezone
+
+from backend.utils.helpers import from_epoch_ms, to_epoch_ms
+
+
+def test_epoch_ms_is_utc():
+    moment = datetime(2024, 1, 1, 12, 0, 0, 123000, tzinfo=timezone.utc)
+    assert to_epoch_ms(moment) == 1704110400123
+    assert from_epoch_ms(1704110400123) == moment
+
+
+def test_repeated_dst_hour_keeps_two_instants(berlin):
+    # 2024-10-27 02:30 happens twice in Berlin, an hour apart
+    first = datetime(2024, 10, 27, 2, 30)
+    second = first.replace(fold=1)
+    assert to_epoch_ms(second) - to_epoch_ms(first) == 3_600_000
+
+    restored = from_epoch_ms(to_epoch_ms(second))
+    assert restored.utcoffset() == timedelta(hours=1)
+    assert restored.replace(tzinfo=None) == second
+    # An aware ISO string, as the collectors write it, is unambiguous
+    assert to_epoch_ms(datetime.fromisoformat(restored.isoformat())) == to_epoch_ms(
+        second
+    )